@@ -1,5 +1,5 @@
 import pygame
-from font_manager import get_font
+from font_manager import get_font, render_text
 from colors import *
 from Stupid import Tab
 import time
@@ -163,7 +163,7 @@ class BaseNode:
                                       int(self.rect.width* self.research_progress), 5)
             pygame.draw.rect(screen, GRAY, progress_rect)
 
-        label = font.render(self.name, True, text_color)
+        label = render_text(font, self.name, True, text_color)
         screen.blit(label, (self.rect.centerx - label.get_width()//2,
                             self.rect.centery - label.get_height()//2))
             
@@ -324,7 +324,7 @@ class TechTree:
             x = 80 + (level - 1) * 130
             # 绘制等级标题
             level_title = f"Lv {level}"
-            title_surface = level_font.render(level_title, True, WHITE)
+            title_surface = render_text(level_font, level_title, True, WHITE)
             title_rect = title_surface.get_rect(center=(x, 40))
             screen.blit(title_surface, title_rect)
         
@@ -385,7 +385,7 @@ class TechTree:
         point_lines = [
             f"Points Left: {data['point']}",
         ]
-        surf= font.render(point_lines[0], True, WHITE)
+        surf= render_text(font, point_lines[0], True, WHITE)
         screen.blit(surf, (SCREEN_WIDTH-500, SCREEN_HEIGHT - 80))
        
     def draw_node_info(self, screen):
@@ -416,51 +416,51 @@ class TechTree:
         # 节点名称
         f1=get_font("ch", "Pixel", 20)
         f2=get_font("en", "Cogmind", 16)
-        name_surface = f1.render(node.name, True, WHITE)#要用中文字体
-        status_surface = f2.render(status, True, WHITE)#用英文字体，紧跟在name后面
+        name_surface = render_text(f1, node.name, True, WHITE)#要用中文字体
+        status_surface = render_text(f2, status, True, WHITE)#用英文字体，紧跟在name后面
         name_width = name_surface.get_width()
         screen.blit(name_surface, (info_x + 10, y_offset))
         screen.blit(status_surface, (info_x + 10 + name_width + 10, y_offset))
         y_offset += 30
         
         # 描述信息
-        desc_line_surface = f1.render(node.description, True, WHITE)
+        desc_line_surface = render_text(f1, node.description, True, WHITE)
         screen.blit(desc_line_surface, (info_x + 10, y_offset))
         y_offset += 18
             
         # 前置需求
         if node.prerequisites:
             y_offset += 10
-            prereq_surface = f1.render("前置需求:", True, WHITE)
+            prereq_surface = render_text(f1, "前置需求:", True, WHITE)
             screen.blit(prereq_surface, (info_x + 10, y_offset))
             y_offset += 18
             
             for prereq in node.prerequisites:
                 color = WHITE if prereq in self.researched else (200, 150, 150)
-                prereq_surface = f1.render(f"*{prereq}", True, color)
+                prereq_surface = render_text(f1, f"*{prereq}", True, color)
                 screen.blit(prereq_surface, (info_x + 15, y_offset))
                 y_offset += 16
 
         # 技能
         if node.unlock_skills:
             y_offset += 10
-            skills_surface = f1.render("解锁技能:", True, WHITE)
+            skills_surface = render_text(f1, "解锁技能:", True, WHITE)
             screen.blit(skills_surface, (info_x + 10, y_offset))
             y_offset += 18
 
             # 拼接技能名
             skill_text = ", ".join(node.unlock_skills)
-            skills_surface = f1.render(skill_text, True, WHITE)
+            skills_surface = render_text(f1, skill_text, True, WHITE)
             screen.blit(skills_surface, (info_x + 15, y_offset))
             y_offset += 18
 
         if hasattr(node, "weapon") and node.weapon:
             y_offset += 10
-            weapon_surface = f1.render("解锁武器:", True, WHITE)
+            weapon_surface = render_text(f1, "解锁武器:", True, WHITE)
             screen.blit(weapon_surface, (info_x + 10, y_offset))
             y_offset += 18
 
-            weapon_surface = f1.render(node.weapon, True, WHITE)
+            weapon_surface = render_text(f1, node.weapon, True, WHITE)
             screen.blit(weapon_surface, (info_x + 15, y_offset))
             y_offset += 18
             girl_img= load_image("arts/weapon_girl.png", (273,273))
@@ -471,7 +471,7 @@ class TechTree:
 
     def draw_skill_view(self,screen,player):
         font = get_font("en", "Cogmind", 16)
-        title = font.render("Skills", True, WHITE)
+        title = render_text(font, "Skills", True, WHITE)
         screen.blit(title, (50, 40))
 
         # 左列：未学习
@@ -479,14 +479,14 @@ class TechTree:
         # 右列：已学习
         x_right, y_right = 300, 80
         for skill in player["available_skills"]:
-            text_surface = font.render(skill, True, WHITE)
+            text_surface = render_text(font, skill, True, WHITE)
             text_rect = text_surface.get_rect(topleft=(x_left, y_left))
             screen.blit(text_surface, text_rect)
             setattr(self, f"skill_rect_{skill}", text_rect)  # 保存点击区域
             y_left += 30
 
         for skill in player["learned_skills"]:
-            text_surface = font.render(f"{skill} (learned)", True, GREEN)
+            text_surface = render_text(font, f"{skill} (learned)", True, GREEN)
             text_rect = text_surface.get_rect(topleft=(x_right, y_right))
             screen.blit(text_surface, text_rect)
             y_right += 30
@@ -1,46 +1,46 @@
-import pygame
 import random
-from font_manager import get_font
-from colors import *
-from Weapon import Weapon,weapon_info
+import heapq
+import copy
+import logging
+from array import array
+from constants import *
+from Weapon import Weapon,weapon_info,get_weapon
+from combo import default_combos, logic_scale
+
+# 战斗逻辑不依赖 pygame，调试输出走 logging（批量模拟时不刷屏）
+logger = logging.getLogger(__name__)
 
 class Status:
+    __slots__ = ("name", "body_part", "is_temp", "stack", "unique", "is_illness", "_duration", "_store", "expires_at")
+
     def __init__(self, name, body_part, duration= 5,is_temp=True, is_illness=False, stack=1, unique=True):
         self.name = name                  # 状态名称，例如 "中毒"、"骨折"
         self.body_part = body_part        # 作用部位，例如 "brain"、"wholebody"、"left_arm"
         self.is_temp = is_temp            # 是否临时（True = 怪物施加/短期状态）
-        self.duration = duration          # 持续回合数（None 代表永久）
+        self._duration = duration         # 持续回合数（None 代表永久）
         self.stack = stack                # 层数，叠加代表强度
         self.unique = unique              # 是否唯一（同名不可重复）
         self.is_illness = is_illness      # 是否疾病
-        
-    
-    def update(self, owner):
-        """每回合更新，返回 True 表示状态消失"""
-        # if self.is_illness:
-        #     return False  # 疾病不会自然消失
-        
-        # Stress 特殊处理
-        if self.name == "Stress" and self.stack >= 3:
-            illness = self.convert(owner)
-            if illness:
-                return True  # Stress 转化后消失
-        
-        # 常规持续时间逻辑
-        if self.duration is not None:
-            self.duration -= 1
-            if self.duration <= 0:
-                self.stack -= 1
-                if self.stack <= 0:
-                    return True
-                else:
-                    self.duration = self.reset_duration()
-        return False
-
+        self._store = None                # 所属的 StatusStore
+        self.expires_at = None            # 到期回合（StatusStore 的回合计数）
+
+    @property
+    def duration(self):
+        """剩余回合数；挂在角色身上时由到期回合推算"""
+        if self._store is None or self.expires_at is None:
+            return self._duration
+        return self.expires_at - self._store.turn
+
+    @duration.setter
+    def duration(self, value):
+        if self._store is None:
+            self._duration = value
+        else:
+            self._store.schedule(self, value)
 
     def __repr__(self):
         if self.duration is None:
-            return f"<Status {self.name} ({self.magnitude}) PERMANENT>"
+            return f"<Status {self.name} ({self.stack}) PERMANENT>"
         return f"<Status {self.name} ({self.stack}), {self.duration} turns>"
     
     def copy(self):
@@ -59,8 +59,8 @@ class Status:
         """每层的独立持续时间，可以自定义"""
         return 50 if self.is_illness else 5 # 例如每层 Stress 默认 5 回合
     
-    def convert(status, owner):
-        """将 Stress 转化为疾病"""
+    def convert(status, owner, rng=random):
+        """将 Stress 转化为疾病；rng 由战斗引擎传入（引擎的种子随机数，推演和回放才能复现）"""
         if status.name != "Stress":
             return None  # 只处理 Stress
         
@@ -73,14 +73,140 @@ class Status:
         chance = min(0.2 * (status.stack - 2), 0.9)  
         # 例: 3层=20%，4层=40%，5层=60%，上限90%
         
-        if random.random() < chance:
-            new_disease_name = random.choice(diseases)
+        if rng.random() < chance:
+            new_disease_name = rng.choice(diseases)
             illness = Status(new_disease_name, body_part, is_illness=True,duration=50)
             owner.add_status(illness)
-            print(f"[!] {owner} 的 {status.stack} 层压力转化为 {illness.name}")
+            logger.info("[!] %s 的 %s 层压力转化为 %s", owner, status.stack, illness.name)
             return illness
         
         return None
+
+
+class StatusStore:
+    """
+    角色身上的状态：按名字索引，另按部位建二级索引
+    到期时间放在最小堆里（惰性删除），每回合只处理真正到期或可能转化的状态
+    """
+    __slots__ = ("turn", "_by_name", "_by_part", "_heap", "_pushed")
+
+    CONVERTIBLE = ("Stress",)   # 每回合需要检查转化的状态
+    CONVERT_STACK = 3           # 达到该层数才会尝试转化
+
+    def __init__(self):
+        self.turn = 0
+        self._by_name = {}   # 名字 -> [Status, ...]（unique 的只有一个）
+        self._by_part = {}   # 部位 -> [Status, ...]
+        self._heap = []      # (到期回合, 序号, Status)
+        self._pushed = 0     # 入堆序号，到期回合相同时按入堆先后
+
+    def __iter__(self):
+        for statuses in list(self._by_name.values()):
+            yield from statuses
+
+    def __len__(self):
+        return sum(len(statuses) for statuses in self._by_name.values())
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    def __bool__(self):
+        return bool(self._by_name)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def copy(self):
+        """独立副本（剩余回合数、到期顺序都相同）：索引和堆按原样复制，不重新排期"""
+        store = StatusStore()
+        store.turn = self.turn
+        store._pushed = self._pushed
+        if not self._by_name:
+            return store
+        mapping = {}
+        for name, statuses in self._by_name.items():
+            copies = store._by_name[name] = []
+            for s in statuses:
+                c = mapping[s] = object.__new__(Status)
+                c.name, c.body_part, c.is_temp, c.stack = s.name, s.body_part, s.is_temp, s.stack
+                c.unique, c.is_illness, c._duration, c.expires_at = s.unique, s.is_illness, s._duration, s.expires_at
+                c._store = store
+                copies.append(c)
+        store._by_part = {part: [mapping[s] for s in statuses] for part, statuses in self._by_part.items()}
+        # 已移除的旧条目照旧指向原来的 Status，tick 时会因为 _store 不是这个仓库而跳过
+        store._heap = [(expires_at, n, mapping.get(s, s)) for expires_at, n, s in self._heap]
+        return store
+
+    def get(self, name):
+        statuses = self._by_name.get(name)
+        return statuses[0] if statuses else None
+
+    def by_part(self, part):
+        return list(self._by_part.get(part, ()))
+
+    def add(self, new_status):
+        """添加状态：如果 unique 且已有同名，就叠加层数和持续时间；返回是否新增"""
+        if new_status.unique:
+            s = self.get(new_status.name)
+            if s is not None:
+                s.duration = new_status.duration+s.duration
+                s.stack = new_status.stack+s.stack
+                return False
+        new_status._store = self
+        self._by_name.setdefault(new_status.name, []).append(new_status)
+        self._by_part.setdefault(new_status.body_part, []).append(new_status)
+        self.schedule(new_status, new_status._duration)
+        return True
+
+    def discard(self, status):
+        if status._store is not self:
+            return
+        status._duration = status.duration
+        status._store = None
+        for index, key in ((self._by_name, status.name), (self._by_part, status.body_part)):
+            statuses = index[key]
+            statuses.remove(status)
+            if not statuses:
+                del index[key]
+
+    def remove(self, name):
+        for s in list(self._by_name.get(name, ())):
+            self.discard(s)
+
+    def schedule(self, status, duration):
+        status._duration = duration
+        if duration is None:
+            status.expires_at = None
+            return
+        status.expires_at = self.turn + duration
+        self._pushed += 1
+        heapq.heappush(self._heap, (status.expires_at, self._pushed, status))
+        # 过期条目太多时重建堆
+        if len(self._heap) > 16 and len(self._heap) > 4 * len(self) + 16:
+            self._heap = [e for e in self._heap if e[2]._store is self and e[2].expires_at == e[0]]
+            heapq.heapify(self._heap)
+
+    def tick(self, owner, rng=random):
+        """每回合更新：先尝试 Stress 转化，再处理到期的层数；没有状态时什么都不做"""
+        if not self._by_name:
+            self._heap.clear()   # 剩下的都是已移除的条目；到期时间是相对 turn 算的，turn 不走也没关系
+            return
+        for name in self.CONVERTIBLE:
+            for s in list(self._by_name.get(name, ())):
+                if s.stack >= self.CONVERT_STACK and s.convert(owner, rng):
+                    self.discard(s)  # Stress 转化后消失
+
+        self.turn += 1
+        heap = self._heap
+        while heap and heap[0][0] <= self.turn:
+            expires_at, _, s = heapq.heappop(heap)
+            if s._store is not self or s.expires_at != expires_at:
+                continue  # 已移除或持续时间被改过
+            s.stack -= 1
+            if s.stack <= 0:
+                self.discard(s)
+            else:
+                s.duration = s.reset_duration()
     
 DISEASE_CONVERSION_TABLE = {
     "brain": ["Depression", "Insomnia", "Sleepy"],   # 抑郁、失眠、焦虑
@@ -91,30 +217,63 @@ DISEASE_CONVERSION_TABLE = {
 
 class Actor:
     def __init__(self, position=0, health=100, sequence_limit=2):
-        self.position = position
+        self.on_position_change = None  # 回调 on_position_change(actor, 旧位置, 新位置)，用于维护位置索引
+        self._position = position
         self.direction = 1
         self.health = health
         self.max_health = health
         self.action_sequence = []
         self.sequence_limit = sequence_limit
         self.sequence_length = 0
+        self.sequence_mask = 0      # 序列里已有的武器编号（位集），unique 检查用
+        self.combo_state = 0        # 连招自动机状态（见 combo），按加入顺序走，只用于加武器时提示连招
         self.damage_multiplier = 1.0
-        self.status = []
-        self.weapons = []
+        self.status = StatusStore()
+        self.weapons = []           # 武器享元列表；冷却在 self.cooldowns 里，下标一一对应
         self.battle_style = "queue"  # 或 stack
         self.on_move_check = None  # 回调（检测位置交换等）
+        self.speed = 100    # 每轮恢复的行动力（见 turn_scheduler），越高越先行动
         self.alive = True   # 是否存活
 
+    @property
+    def weapons(self):
+        return self._weapons
+
+    @weapons.setter
+    def weapons(self, weapons):
+        self._weapons = list(weapons)
+        self.cooldowns = array("h", bytes(2 * len(self._weapons)))  # 每把武器剩余冷却回合
+
+    def add_weapon(self, weapon):
+        self._weapons.append(weapon)
+        self.cooldowns.append(0)
+
+    def is_weapon_ready(self, index):
+        return self.cooldowns[index] == 0
+
+    @property
+    def logic(self):
+        """Logic 属性（影响连招加成），普通角色取基准值"""
+        return LOGIC_BASE
+
+    def in_sequence(self, index):
+        return bool(self.sequence_mask >> index & 1)
+
+    @property
+    def position(self):
+        return self._position
+
+    @position.setter
+    def position(self, value):
+        old = self._position
+        self._position = value
+        if self.on_position_change:
+            self.on_position_change(self, old, value)
+
     def add_status(self, new_status):
-        """添加状态：如果 unique 且已有同名，就覆盖"""
-        if new_status.unique:
-            for s in self.status:
-                if s.name == new_status.name:
-                    s.duration = new_status.duration+s.duration
-                    s.stack = new_status.stack+s.stack
-                    return
-        self.status.append(new_status)
-        print("Added status:", new_status)
+        """添加状态：如果 unique 且已有同名，就叠加"""
+        if self.status.add(new_status):
+            logger.debug("Added status: %s", new_status)
 
     def apply_weapon_effects(self, target, weapon):
         """应用武器的附加状态"""
@@ -122,24 +281,36 @@ class Actor:
             target.add_status(status.copy())
 
     def remove_status(self, status_name):
-        self.status = [s for s in self.status if s.name != status_name]
+        self.status.remove(status_name)
 
-    def update_statuses(self):
-        """每回合更新所有状态"""
-        self.status = [s for s in self.status if not s.update(self)]
+    def update_statuses(self, rng=random):
+        """每回合更新所有状态，rng 给 Stress 转化用"""
+        self.status.tick(self, rng)
 
     def get_status_by_part(self, part):
         """获取某个部位的所有状态"""
-        return [s for s in self.status if s.body_part == part]
+        return self.status.by_part(part)
+
+    def clone(self):
+        """复制战斗状态（序列、冷却、状态），武器享元共用；回调需要由调用方重新绑定"""
+        c = object.__new__(type(self))
+        c.__dict__.update(self.__dict__)
+        return self._copy_state(c)
+
+    def _copy_state(self, c):
+        """clone 的后半段：浅拷贝 c 里和 self 共用的可变字段换成独立副本"""
+        c.on_move_check = None
+        c.on_position_change = None
+        c.action_sequence = list(self.action_sequence)
+        c._weapons = list(self._weapons)
+        c.cooldowns = array("h", self.cooldowns)
+        c.status = self.status.copy()
+        return c
     
     def take_damage(self, damage, scene):
-        """接受伤害并检查是否死亡"""
-        self.health -= damage
-        if self.health <= 0:
-            self.die(scene)  # 传入场景来移除角色
-        self.add_status(Status("Simplified", "brain", is_illness=True))#666
-        # self.add_status(Status("PC addict", "brain", is_illness=True))
-        # self.add_status(Status("Diabetes", "wholebody", is_illness=True))
+        """单独受到一次伤害：走场景的伤害流水线并立即结算（状态、死亡）"""
+        scene.add_hit(self, damage)
+        scene.resolve_hits()
 
     def die(self, scene):
         """角色死亡的基础逻辑"""
@@ -150,39 +321,74 @@ class Actor:
     def remove_from_scene(self, scene):
         """从场景中移除角色"""
         if isinstance(self, Player):
-            print(f"Removing player from the scene...")
+            logger.debug("Removing player from the scene...")
         elif isinstance(self, Enemy):
-            scene.enemies.remove(self)  # 移除敌人
+            scene.remove_enemy(self)  # 移除敌人
         else:
             print(f"Unknown actor type: {self.name}")
     
     def update_cooldowns(self):
-        for weapon in self.weapons:
-            weapon.update_cooldown()
+        """所有冷却减 1，返回是否有武器冷却好了（1 -> 0，执行计划可能因此改变）"""
+        cooldowns = self.cooldowns
+        if not any(cooldowns):
+            return False
+        ready = False
+        for i, c in enumerate(cooldowns):
+            if c > 0:
+                cooldowns[i] = c - 1
+                ready = ready or c == 1
+        return ready
 
     def try_add_weapon_to_sequence(self, index, scene):
         if index < len(self.weapons):
             weapon = self.weapons[index]
-            if weapon.unique_in_sequence and any(action == index for action in self.action_sequence):
+            if weapon.unique_in_sequence and self.in_sequence(index):
                 return False, f"{weapon.name} Already in Sequence!"
             if self.sequence_length >= self.sequence_limit:
                 return False, "Reached Max Sequence Length!"
-            elif self.weapons[index].is_ready():
+            elif self.cooldowns[index] == 0:
                 self.action_sequence.append(index)
                 self.sequence_length += 1
+                self.sequence_mask |= 1 << index
+                # 连招自动机走一步，提示这一步完成的连招；伤害加成在执行时按实际顺序结算（见 planned_actions）
+                self.combo_state = default_combos.step(self.combo_state, weapon.name)
+                combos = default_combos.matches(self.combo_state)
+                if combos:
+                    return True, f"{weapon.name} Added, Combo: {', '.join(combos)}!"
                 return True, f"{weapon.name} Added"
             else:
                 return False, f"{weapon.name} Cooling!"
         return False, "无效的武器编号"
     
-    def execute_sequence(self):
-        executed_actions = []
-        for index in self.action_sequence:
+    def planned_actions(self):
+        """
+        按实际执行顺序（stack 风格倒序）列出 [(武器编号, 武器, 连招额外伤害比例), ...]，不改动状态
+        冷却中的武器跳过；连招只按真正执行的武器依次识别，加成记在完成连招的那一步上
+        """
+        order = self.action_sequence[::-1] if self.battle_style == "stack" else self.action_sequence
+        cooldowns = self.cooldowns
+        fired = {}   # 本次已执行的武器编号 -> 执行后的冷却（同一把武器在序列里出现两次时用）
+        state = 0
+        scale = logic_scale(self.logic)
+        actions = []
+        for index in order:
+            if fired.get(index, cooldowns[index]) != 0:
+                continue
             weapon = self.weapons[index]
-            if weapon.use():
-                executed_actions.append((index, weapon))
+            fired[index] = weapon.cooldown
+            state = default_combos.step(state, weapon.name)
+            actions.append((index, weapon, default_combos.bonus(state) * scale))
+        return actions
+
+    def execute_sequence(self):
+        """返回 planned_actions()，武器进入冷却，并清空序列"""
+        executed_actions = self.planned_actions()
+        for index, weapon, _ in executed_actions:
+            self.cooldowns[index] = weapon.cooldown
         self.action_sequence.clear()
         self.sequence_length = 0
+        self.sequence_mask = 0
+        self.combo_state = 0
         return executed_actions
     
     def can_move_to(self, new_pos):
@@ -216,6 +422,8 @@ class Player(Actor):
             "skill":5,
         }
         self.swap_cooldown = 0  # 记录换位剩余冷却回合数
+        self.version = 0        # 战斗外的改动（解锁武器、技能、研究等）每次加一，预测结果按它判断是否过期
+        self.on_change = None   # 回调 on_change(player)，战斗引擎用来作废推演
         self.available_skills = set(["Greenhand"])  # 可见技能
         self.learned_skills = set(["Student"])
         self.skill_effects = {}  # 技能效果字典
@@ -236,29 +444,30 @@ class Player(Actor):
         super().die(scene)  # 调用父类的 die() 处理基本死亡逻辑
         scene.game_state = "game_over"   # ✅ 切换游戏状态，而不是删掉 player
 
+    @property
+    def logic(self):
+        return self.base_stats["L"]
+
     def game_over(self):
         """游戏结束的逻辑"""
         print("Ending the game...")
 
 
+    def changed(self):
+        """战斗外改了玩家（武器、技能、属性、血量上限等）后调用"""
+        self.version += 1
+        if self.on_change:
+            self.on_change(self)
+
     def unlock_weapon(self, weapon_name):
-        if weapon_name not in self.weapons:
-            if weapon_name in weapon_info:
-                w = weapon_info[weapon_name]
-                new_weapon = Weapon(
-                    weapon_name,
-                    w["damage"],
-                    w["pattern"],
-                    w["cooldown"],
-                    w["color"],
-                    weapon_type=w["weapon_type"],
-                    unique_in_sequence=w["unique_in_sequence"],
-                    range=w.get("range", None)
-                )
-                self.weapons.append(new_weapon)
-                print(f"已解锁武器：{weapon_name}")
+        if all(w.name != weapon_name for w in self.weapons):
+            new_weapon = get_weapon(weapon_name)
+            if new_weapon:
+                self.add_weapon(new_weapon)
+                logger.info("已解锁武器：%s", weapon_name)
+                self.changed()
             else:
-                print(f"武器名 {weapon_name} 不存在于weapon字典中。")
+                logger.warning("武器名 %s 不存在于weapon字典中。", weapon_name)
 
     def unlock_skill(self, skill_name: str):
         """解锁技能，并立即应用其效果"""
@@ -276,6 +485,7 @@ class Player(Actor):
             print(f"[Skill] 解锁技能 {skill_name}，效果已生效。")
         else:
             print(f"[Skill] {skill_name} 未在技能库中定义。")
+        self.changed()
         return True
 
 class Enemy(Actor):
@@ -285,8 +495,11 @@ class Enemy(Actor):
                          health=monster_data["health"], 
                          sequence_limit=monster_data["sequence_limit"])
 
+        self.monster_id = monster_id
+
         self.name = monster_data["name"]
         self.type = monster_data["type"]
+        self.speed = monster_data.get("speed", self.speed)
 
         # 根据怪物表装载武器
         self.weapons = [WEAPON_LIBRARY[w] for w in monster_data["weapons"]]
@@ -296,6 +509,7 @@ class Enemy(Actor):
         self.intent_index = 0           # 当前执行到第几个意图
         self.intent_progress = 0        # 当前意图中的武器进度
 
+        self.ai_mode = "intent"  # "intent" 固定意图 / "utility" 效用打分（由 CombatEngine 设置）
         self.waiting = False  
         self.ready_to_attack = False
         self.adding = False
@@ -305,7 +519,7 @@ class Enemy(Actor):
     def die(self,scene):
         """敌人死亡时的特殊逻辑"""
         super().die(scene)  # 调用父类的 die() 处理基本死亡逻辑
-        print(f"Enemy dropped loot!")  # 显示敌人掉落物品提示
+        logger.debug("Enemy dropped loot!")  # 显示敌人掉落物品提示
         # 这里可以增加掉落物品的逻辑
 
     def execute_intent(self, scene):
@@ -322,7 +536,7 @@ class Enemy(Actor):
 
             if weapon_index is not None:
                 success, msg = self.try_add_weapon_to_sequence(weapon_index, scene)
-                print(msg)
+                logger.debug(msg)
                 if success:
                     self.intent_progress += 1
                     self.adding = False
@@ -390,7 +604,6 @@ class Enemy(Actor):
                     return distance <= 1
                 elif self.type == "range":
                     if scene.can_see(self,player):
-                        print(f"Weapon Range:{self.weapons[0].range}, :{self.weapons[self.action_sequence[0]].range}")
                         if self.weapons[self.action_sequence[0]].range!=None:
                             return distance <= self.weapons[self.action_sequence[0]].range
                         else :
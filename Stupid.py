@@ -2,6 +2,7 @@ import pygame
 import sys
 from fight import *
 from help import HelpSystem
+from font_manager import get_font, render_text
 from colors import *
 from pages import *
 
@@ -36,7 +37,7 @@ class MainMenu:
     def draw(self, screen):
         screen.fill(BLACK)
         menu_font = get_font("en","Patriot",50)
-        title_surface = menu_font.render("Simplicity is all YOU Need", True, WHITE)
+        title_surface = render_text(menu_font, "Simplicity is all YOU Need", True, WHITE)
         title_rect = title_surface.get_rect(center=(SCREEN_WIDTH//2, 100))
         screen.blit(title_surface, title_rect)
 
@@ -50,7 +51,7 @@ class MainMenu:
 
             image = load_image(f"arts/sprite/{self.options[i]}.png")
             render_1bit_sprite(screen, image, (380, 270 + i*50 - image.get_width()//2), color)
-            text_surface = self.font.render(option, True, color)
+            text_surface = render_text(self.font, option, True, color)
             text_rect = text_surface.get_rect(center=(SCREEN_WIDTH//2, 270 + i*50))
             screen.blit(text_surface, text_rect)
             
@@ -96,6 +97,18 @@ class MainMenu:
                     else:
                         waiting = False
 
+def toolbar_regions(toolbar, screen):
+    """工具栏标签在战斗界面上的可变区域，签名是 (名字, 是否打开, 是否悬停)；给脏矩形模式用"""
+    mouse_pos = pygame.mouse.get_pos()
+    regions = {}
+    for i, tab in enumerate(toolbar.tabs or ()):
+        rect = getattr(tab, "rect", None)
+        if rect is None:   # 拿不到标签的位置：鼠标一动或标签状态一变就整屏重画
+            return {"toolbar": (screen.get_rect(), (mouse_pos, tuple(t.is_active for t in toolbar.tabs)))}
+        rect = pygame.Rect(rect)
+        regions[("tab", i)] = (rect, (tab.name, tab.is_active, rect.collidepoint(mouse_pos)))
+    return regions
+
 def main():
     # 设置屏幕
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
@@ -117,6 +130,7 @@ def main():
     help_system = HelpSystem()
     menu = MainMenu(en_Cogmind_20)
     game_state = GAME_STATE_MENU  # ✅ 初始状态是菜单
+    dirty_frame = False  # 上一帧是否走了脏矩形渲染
     running = True
     while running:
         # 1. 事件处理
@@ -136,10 +150,6 @@ def main():
             elif game_state == GAME_STATE_PLAYING:
                 if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
                     pass
-                elif event.type == pygame.USEREVENT + 1:
-                    if fight_scene.game_state == "enemy_turn":
-                        fight_scene.execute_enemy_turn(fight_scene)
-                        pygame.time.set_timer(pygame.USEREVENT + 1, 0)
             # 工具栏事件
             toolbar.handle_event(event,fight_scene.player)
 
@@ -157,18 +167,32 @@ def main():
 
             
 
+        dirty_rects = None  # None 表示整屏 flip
         if game_state == GAME_STATE_MENU:
             menu.draw(screen)
         elif game_state == GAME_STATE_PLAYING:
             toolbar.update(fight_scene.player)  # 这里处理科技树等进度
-            screen.fill(BLACK)
-            if not toolbar.tabs or not any(tab.is_active for tab in toolbar.tabs):
-                fight_scene.draw(screen)
-            toolbar.draw(screen, ch_Pixel_20,fight_scene.get_player_data())
-            help_system.draw(screen, ch_Pixel_20)
-                
-
-        pygame.display.flip()
+            fight_scene.update(clock.get_time())  # 推进连招播放
+            in_fight = not toolbar.tabs or not any(tab.is_active for tab in toolbar.tabs)
+            if in_fight and not help_system.is_visible and fight_scene.render_mode == "dirty":
+                # 脏矩形模式：只重绘变化的区域
+                if not dirty_frame:
+                    fight_scene.invalidate()
+                dirty_rects = fight_scene.draw_dirty(
+                    screen, overlay=lambda s: toolbar.draw(s, ch_Pixel_20, fight_scene.get_player_data()),
+                    overlay_regions=lambda: toolbar_regions(toolbar, screen))
+            else:
+                screen.fill(BLACK)
+                if in_fight:
+                    fight_scene.draw(screen)
+                toolbar.draw(screen, ch_Pixel_20,fight_scene.get_player_data())
+                help_system.draw(screen, ch_Pixel_20)
+        dirty_frame = dirty_rects is not None
+
+        if dirty_rects is None:
+            pygame.display.flip()
+        elif dirty_rects:
+            pygame.display.update(dirty_rects)
         clock.tick(60)
     
     pygame.quit()
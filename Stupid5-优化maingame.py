@@ -3,6 +3,13 @@ import sys
 import random
 import logging
 import json
+import ascii_art
+from colors import load_image   # 和战斗界面共用一份图片缓存
+from dungeon_map import DungeonGrid, FLOOR, ONE_SHOT, FreeCells, carve_rooms, connect, level_seed
+from dungeon_view import DungeonView
+from font_manager import render_text
+from level_store import LevelStore, pack_level, unpack_level
+from prefetch import Prefetcher
 
 def load_events_from_json(filepath):
     with open(filepath, 'r', encoding='utf-8') as f:
@@ -43,16 +50,6 @@ logger = logging.getLogger(__name__)
 # except pygame.error as e:
 #     print(f"无法载入背景音乐: {e}")
 
-def load_image(path, scale=None):
-    try:
-        image = pygame.image.load(path)
-        if scale:
-            image = pygame.transform.scale(image, scale)
-        return image
-    except pygame.error:
-        logger.error("Failed to load image: %s", path)
-        return pygame.Surface((100, 100))  # Fallback
-
 # 字体和颜色
 FONT = pygame.font.SysFont("Perfect DOS VGA 437", 24)
 CN_FONT = pygame.font.SysFont("萝莉体", 24)
@@ -63,6 +60,9 @@ GRAY = (100, 100, 100)
 GREEN = (0, 200, 0)
 RED = (200, 0, 0)
 
+# 地牢视口：每格 40 像素，从 (100, 50) 开始最多显示 20x12 格，镜头跟随玩家
+dungeon_view = DungeonView(CN_FONT, tile_size=40, origin=(100, 50), view_size=(20, 12))
+
 # 截获属性变化
 class AutoUpdateDict(dict):
     def __init__(self, parent, *args, **kwargs):
@@ -335,7 +335,7 @@ class Equipment:
 
 # 显示文字
 def draw_text(text, x, y, font=FONT, color=WHITE):
-    rendered = font.render(text, True, color)
+    rendered = render_text(font, text, True, color)
     screen.blit(rendered, (x, y))
 
 def attribute_allocation(player):
@@ -384,23 +384,8 @@ def attribute_allocation(player):
                         points_to_remove += 1
 
 def render_ascii_art(screen, label,font_size=18, x=10, y=20, color=WHITE):
-    """从 JSON 加载 ASCII Art 并使用字体渲染指定标签的图像"""
-    # 加载 ASCII art 数据
-    with open("ASCII.json", "r", encoding="utf-8") as f:
-        arts = json.load(f)
-    
-    # 加载字体
-    font = pygame.freetype.Font("Saitamaar-Regular.ttf", font_size)
-
-    # 查找对应标签
-    art = next((a for a in arts if a["label"] == label), None)
-    if not art:
-        print(f"[!] 未找到标签: {label}")
-        return
-
-    # 渲染每一行
-    for i, line in enumerate(art["lines"]):
-        font.render_to(screen, (x, y + i * font_size), line, color)
+    """从 ASCII art 库取出预渲染好的图像并绘制（freetype 渲染）"""
+    ascii_art.default_library.draw(screen, label, font_size=font_size, x=x, y=y, color=color, use_freetype=True)
 
 # 像视觉小说一样显示文字
 def draw_multiline_dialog(text_lines, start_y=80, font=FONT, color=WHITE, line_spacing=40):
@@ -731,24 +716,65 @@ def draw_inventory_items_for_slot(slot):
     return available_items
 
 class Dungeon:
-    def __init__(self, width=10, height=10, level=1, monster_templates=None):
+    """
+    地形存在 DungeonGrid（每格一个字节）里，玩家和怪物是单独的一层：
+    player_pos 是 [y, x]，monster_cells 是 (y, x) -> 该格的怪物记录列表
+    get_tile 返回叠上角色后的显示字符（'@' / 'M'），和以前直接读 map 的结果一致
+    """
+    def __init__(self, width=10, height=10, level=1, monster_templates=None, generate=True, seed=None, rooms=False):
         self.width = width
         self.height = height
         self.level = level  # 地牢层数
-        self.map = [['#' for _ in range(width)] for _ in range(height)]
+        self.seed = random.randrange(1 << 32) if seed is None else seed  # 同一个种子生成同一层
+        self.rooms = rooms  # True: 房间+走廊，False: 随机洞穴
+        self.grid = DungeonGrid(width, height)
         self.player_pos = [1, 1]
         global monster_template1
         self.monster_templates = monster_templates or monster_template1
         self.monsters = []
+        self.monster_cells = {}
         self.event_triggers = {}
-        self.generate_dungeon()
+        if generate:
+            self.generate_dungeon()
+
+    def to_bytes(self):
+        """存档用的二进制编码（见 level_store）"""
+        meta = {
+            "seed": self.seed,
+            "events": [[y, x, value] for (y, x), value in self.event_triggers.items()],
+            "monsters": [[m['x'], m['y'], m['monster'].name, m['monster'].attack_type, m['monster'].difficulty]
+                         for m in self.monsters],
+        }
+        return pack_level(self.width, self.height, self.level, self.player_pos, self.grid.tiles, meta)
+
+    @classmethod
+    def from_bytes(cls, data):
+        record = unpack_level(data)
+        dungeon = cls(record["width"], record["height"], record["level"], generate=False,
+                      seed=record["meta"]["seed"])
+        dungeon.grid.tiles[:] = record["tiles"]
+        dungeon.grid.mark_all()
+        dungeon.player_pos = record["player_pos"]
+        dungeon.event_triggers = {(y, x): value for y, x, value in record["meta"]["events"]}
+        for x, y, name, attack_type, difficulty in record["meta"]["monsters"]:
+            dungeon.add_monster({'x': x, 'y': y, 'monster': Monster(x, y, name, attack_type, difficulty)})
+        return dungeon
+
+    def nbytes(self):
+        return self.grid.nbytes()
 
     def generate_dungeon(self):
-        for y in range(1, self.height-1):
-            for x in range(1, self.width-1):
-                self.map[y][x] = '.' if random.random() < 0.9 else '#'
-
-        self.map[self.player_pos[0]][self.player_pos[1]] = '@'
+        """全部随机数都来自 Random(seed)，生成时间只和地图大小线性相关"""
+        rng = self.rng = random.Random(self.seed)
+        if self.rooms:
+            x, y = carve_rooms(self.grid, rng)
+            self.player_pos = [y, x]
+        else:
+            self.grid.fill_random(rng, 0.9)
+        start = (self.player_pos[1], self.player_pos[0])
+        # 走不到的区域填成墙，剩下的空地都和起点连通
+        connect(self.grid, start, rng)
+        self.free_cells = FreeCells(self.grid, exclude=[start])
 
         # 放一个向下楼梯
         self.place_stairs('>')
@@ -760,65 +786,85 @@ class Dungeon:
         self.place_events(3)  # 放3个事件
         self.place_special_rewards()
         self.place_monsters(3)  # 放3个怪物
+        self.free_cells = self.rng = None  # 只在生成时用
 
     def place_stairs(self, symbol):
-        while True:
-            x = random.randint(1, self.width-2)
-            y = random.randint(1, self.height-2)
-            if self.map[y][x] == '.':
-                self.map[y][x] = symbol
-                break
+        cell = self.free_cells.pop(self.rng)
+        if cell:
+            self.grid.set(cell[0], cell[1], symbol)
 
     def place_special_rewards(self):
         if self.level == 2:
             # 第三层生成智力药水
-            while True:
-                x = random.randint(1, self.width-2)
-                y = random.randint(1, self.height-2)
-                if self.map[y][x] == '.':
-                    self.map[y][x] = '✦'  # 特别用药水图标
-                    self.event_triggers[(y, x)] = "int_potion"
-                    break
-
+            cell = self.free_cells.pop(self.rng)
+            if cell:
+                x, y = cell
+                self.grid.set(x, y, '✦')  # 特别用药水图标
+                self.event_triggers[(y, x)] = "int_potion"
 
     def place_events(self, count):
-        placed = 0
-        while placed < count:
-            x = random.randint(1, self.width-2)
-            y = random.randint(1, self.height-2)
-            if self.map[y][x] == '.':
-                self.map[y][x] = '⚠'
-                self.event_triggers[(y, x)] = random.randint(0, len(events)-1)
-                placed += 1
+        for _ in range(count):
+            cell = self.free_cells.pop(self.rng)
+            if cell is None:
+                break
+            x, y = cell
+            self.grid.set(x, y, '⚠')
+            self.event_triggers[(y, x)] = self.rng.randint(0, len(events)-1)
 
     def place_monsters(self, count):
-        placed = 0
-        while placed < count:
-            x = random.randint(1, self.width-2)
-            y = random.randint(1, self.height-2)
-            if self.map[y][x] == '.' and (y, x) != tuple(self.player_pos):
-                template = random.choice(self.monster_templates)
-                self.monsters.append({'x': x, 'y': y, 'monster': template.clone(x, y)})
-                self.map[y][x] = 'M'
-                placed += 1
+        for _ in range(count):
+            cell = self.free_cells.pop(self.rng)
+            if cell is None:
+                break
+            x, y = cell
+            template = self.rng.choice(self.monster_templates)
+            self.add_monster({'x': x, 'y': y, 'monster': template.clone(x, y)})
+
+    # ---- 角色层 ----
+    def add_monster(self, m):
+        self.monsters.append(m)
+        self.monster_cells.setdefault((m['y'], m['x']), []).append(m)
+
+    def remove_monster(self, m):
+        self.monsters.remove(m)
+        cell = self.monster_cells[(m['y'], m['x'])]
+        cell.remove(m)
+        if not cell:
+            del self.monster_cells[(m['y'], m['x'])]
+
+    def relocate_monster(self, m):
+        """怪物对象的 x, y 变了之后，同步记录和索引"""
+        monster = m['monster']
+        if (m['x'], m['y']) == (monster.x, monster.y):
+            return
+        self.remove_monster(m)
+        m['x'], m['y'] = monster.x, monster.y
+        self.add_monster(m)
+
+    def monster_at(self, x, y):
+        cell = self.monster_cells.get((y, x))
+        return cell[0] if cell else None
 
     def is_passable(self, x, y):
-        return self.map[y][x] not in ['#', '~']
+        return self.grid.is_passable(x, y)
             
     def move_player(self, dx, dy):
         new_x = self.player_pos[1] + dx
         new_y = self.player_pos[0] + dy
-        if self.is_passable(new_x, new_y):
-            self.map[self.player_pos[0]][self.player_pos[1]] = '.'
-            self.map[new_y][new_x] = '@'
+        if self.grid.is_passable(new_x, new_y):
+            # 事件、奖励踩过就变成空地，只触发一次；楼梯留着，回到这一层还能用
+            if self.grid.get_code(new_x, new_y) in ONE_SHOT:
+                self.grid.set_code(new_x, new_y, FLOOR)
             self.player_pos = [new_y, new_x]
             return True
         return False
 
     def get_tile(self, x, y):
-        if 0 <= y < self.height and 0 <= x < self.width:
-            return self.map[y][x]
-        return '#'
+        if [y, x] == self.player_pos:
+            return '@'
+        if (y, x) in self.monster_cells:
+            return 'M'
+        return self.grid.get(x, y)
 
     def draw_main(self):
         Header(player)
@@ -828,15 +874,7 @@ class Dungeon:
 
     def draw_dungeon(self, dungeon):
         screen.fill(BLACK)
-        tile_size = 40
-        for y in range(dungeon.height):
-            for x in range(dungeon.width):
-                tile = dungeon.get_tile(x, y)
-                draw_text(tile, x * tile_size + 100, y * tile_size + 50, CN_FONT, WHITE if tile != '@' else GREEN)
-        for m in self.monsters:
-            x = m['monster'].x
-            y = m['monster'].y
-            draw_text('M', x * tile_size + 100, y * tile_size + 50, CN_FONT, WHITE)
+        dungeon_view.draw(screen, dungeon, player_color=GREEN)
 
         draw_text("Arrow key to move,Press I to open backpack", 50, HEIGHT-50, CN_FONT, WHITE)
         target_image = load_image('assets/target.png',(80,60))
@@ -914,7 +952,14 @@ class GameState(Enum):
 class GameStateManager:
     def __init__(self, player):
         self.state = GameState.DUNGEON
-        self.dungeon = Dungeon()
+        self.run_seed = random.randrange(1 << 32)  # 整局的种子，每层的种子由它和层数推出
+        self.dungeon = self.new_level(1)
+        # 离开的楼层存起来，回来时原样取回；最近 4 层在内存，更早的在后台写到磁盘
+        self.levels = LevelStore(Dungeon.to_bytes, Dungeon.from_bytes, max_levels=4, sizeof=Dungeon.nbytes,
+                                 background_spill=True)
+        # 后台线程提前准备上下两层，走楼梯时直接换上
+        self.prefetcher = Prefetcher("level-prefetch")
+        self.prefetch_neighbours()
         self.player = player
         self.selected_slot = None
         self.move_count = 0
@@ -957,9 +1002,9 @@ class GameStateManager:
     def handle_tile_effect(self, tile):
         pos = tuple(self.dungeon.player_pos)
         if tile == '>':
-            self.dungeon = Dungeon(level=self.dungeon.level + 1, monster_templates=monster_template1)
+            self.change_level(self.dungeon.level + 1)
         elif tile == '<' and self.dungeon.level > 1:
-            self.dungeon = Dungeon(level=self.dungeon.level - 1, monster_templates=monster_template1)
+            self.change_level(self.dungeon.level - 1)
         elif tile == '⚠':
             event_index = self.dungeon.event_triggers.get(pos)
             if event_index is not None:
@@ -968,11 +1013,10 @@ class GameStateManager:
             trigger_ending_event(self.player)
             self.state = GameState.END
         elif tile == 'M':
-            for m in self.dungeon.monsters:
-                if (m['x'], m['y']) == (pos[1], pos[0]):
-                    self.combat(m['monster'])
-                    self.dungeon.monsters.remove(m)
-                    break
+            m = self.dungeon.monster_at(pos[1], pos[0])
+            if m is not None:
+                self.combat(m['monster'])
+                self.dungeon.remove_monster(m)
         elif self.move_count % 20 == 0:
             show_event(random.choice(events))
             if "auto_heal" in player.buffs:
@@ -980,28 +1024,47 @@ class GameStateManager:
 
         self.move_monsters()  # 怪物在玩家行动后移动
 
-    def move_monsters(self):
-        for m in self.dungeon.monsters:
-            monster = m['monster']
+    def new_level(self, depth):
+        return Dungeon(level=depth, monster_templates=monster_template1, seed=level_seed(self.run_seed, depth))
 
-            # 清除旧位置
-            if self.dungeon.map[monster.y][monster.x] == 'M':
-                self.dungeon.map[monster.y][monster.x] = '.'
+    def change_level(self, depth):
+        """存下当前楼层，进入 depth 层：优先用后台准备好的，其次取回存档，都没有才现场生成"""
+        self.levels.stash(self.dungeon.level, self.dungeon)
+        dungeon = self.prefetcher.take(depth)
+        if dungeon is not None:
+            self.levels.forget(depth)
+        else:
+            dungeon = self.levels.take(depth) or self.new_level(depth)
+        self.dungeon = dungeon
+        self.prefetch_neighbours()
+
+    def prefetch_neighbours(self):
+        """
+        后台准备当前楼层的上下两层：没去过的按种子生成，写到磁盘的读回来；已在内存里的不用管
+        磁盘存档只有离开那一层时才会改写，所以后台读到的和到时候再读的一样
+        """
+        depth = self.dungeon.level
+        neighbours = [d for d in (depth + 1, depth - 1) if d >= 1]
+        self.prefetcher.retain(neighbours)
+        for d in neighbours:
+            if self.levels.on_disk(d):
+                self.prefetcher.submit(d, lambda d=d: self.levels.load(d))
+            elif d not in self.levels:
+                self.prefetcher.submit(d, lambda d=d: self.new_level(d))
 
-            # 原位置记录
-            old_x, old_y = monster.x, monster.y
+    def move_monsters(self):
+        player_cell = tuple(self.dungeon.player_pos)
+        for m in list(self.dungeon.monsters):
+            monster = m['monster']
 
             # 尝试移动
             monster.move_randomly(self.dungeon)
+            self.dungeon.relocate_monster(m)
 
             # 若怪物踩到玩家，触发战斗
-            if self.dungeon.map[monster.y][monster.x] == '@':
+            if (monster.y, monster.x) == player_cell:
                 self.combat(monster)
-                self.dungeon.monsters.remove(m)
-            else:
-                self.dungeon.map[monster.y][monster.x] = 'M'
-
-            
+                self.dungeon.remove_monster(m)
 
     def handle_inventory_event(self, event):
         if event.type == pygame.KEYDOWN:
@@ -1053,6 +1116,8 @@ def main_game():
                 manager.handle_event(event)
         manager.update()
         pygame.display.flip()
+    manager.prefetcher.close()
+    manager.levels.close()
 
 
             
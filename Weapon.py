@@ -1,29 +1,57 @@
-from colors import *
+from constants import *
+
 class Weapon:
+    """
+    武器的静态数据（享元）：同名武器全局只有一份，创建后不可修改
+    冷却等可变状态放在角色自己的 cooldowns 数组里（见 Actor）
+    """
+    __slots__ = ("name", "damage", "pattern", "cooldown", "color", "weapon_type", "unique_in_sequence", "range", "status_effects")
+
     def __init__(self, name, damage, pattern, cooldown, color,weapon_type="melee",unique_in_sequence=True,range=None,status_effects=None):
-        self.name = name
-        self.damage = damage
-        self.pattern = pattern  # 相对于玩家位置的攻击范围
-        self.cooldown = cooldown
-        self.current_cooldown = 0
-        self.color = color
-        self.weapon_type = weapon_type  # 新增字段：melee / ranged / targeted
-        self.unique_in_sequence = unique_in_sequence
-        self.range=range
-        self.status_effects = status_effects or []  # 支持多个状态效果
-    
-    def is_ready(self):
-        return self.current_cooldown == 0
-    
-    def use(self):
-        if self.is_ready():
-            self.current_cooldown = self.cooldown
-            return True
-        return False
-    
-    def update_cooldown(self):
-        if self.current_cooldown > 0:
-            self.current_cooldown -= 1
+        init = object.__setattr__
+        init(self, "name", name)
+        init(self, "damage", damage)
+        init(self, "pattern", tuple(pattern))  # 相对于玩家位置的攻击范围
+        init(self, "cooldown", cooldown)
+        init(self, "color", color)
+        init(self, "weapon_type", weapon_type)  # 新增字段：melee / ranged / targeted
+        init(self, "unique_in_sequence", unique_in_sequence)
+        init(self, "range", range)
+        init(self, "status_effects", tuple(status_effects or ()))  # 支持多个状态效果（模板，施加时复制）
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"Weapon 是共享的只读数据，不能修改 {key}")
+
+    def __repr__(self):
+        return f"<Weapon {self.name}>"
+
+    # 享元不需要复制，拷贝战斗状态时直接共用
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+_weapon_cache = {}  # 武器名 -> Weapon（weapon_info 里的玩家武器）
+
+def get_weapon(name):
+    """按名字取玩家武器的享元，不存在返回 None"""
+    weapon = _weapon_cache.get(name)
+    if weapon is None and name in weapon_info:
+        w = weapon_info[name]
+        weapon = Weapon(
+            name,
+            w["damage"],
+            w["pattern"],
+            w["cooldown"],
+            w["color"],
+            weapon_type=w["weapon_type"],
+            unique_in_sequence=w["unique_in_sequence"],
+            range=w.get("range", None)
+        )
+        _weapon_cache[name] = weapon
+    return weapon
 
 weapon_info = {
     "Hello World": {
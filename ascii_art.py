@@ -0,0 +1,105 @@
+# ascii_art.py
+# ASCII art 库：索引只读一次，每个 (标签, 字号, 颜色) 预渲染成一张 Surface，之后只需一次 blit
+
+import json
+import pygame
+import pygame.freetype
+from cache import LRUCache
+
+ASCII_INDEX_PATH = "ASCII.json"
+ASCII_FONT_PATH = "Saitamaar-Regular.ttf"
+ASCII_CACHE_MAX_ITEMS = 16
+ASCII_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+def _surface_bytes(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+class AsciiArtLibrary:
+    def __init__(self, index_path=ASCII_INDEX_PATH, font_path=ASCII_FONT_PATH,
+                 max_items=ASCII_CACHE_MAX_ITEMS, max_bytes=ASCII_CACHE_MAX_BYTES):
+        self.index_path = index_path
+        self.font_path = font_path
+        self._index = None      # label -> 索引条目
+        self._lines = {}        # label -> 文本行
+        self._fonts = {}        # (字号, 是否 freetype) -> 字体
+        self._missing = set()   # 已提示过的缺失标签
+        self._surfaces = LRUCache(max_items=max_items, max_bytes=max_bytes, sizeof=_surface_bytes)
+
+    def _load_index(self):
+        if self._index is None:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                arts = json.load(f)
+            self._index = {a["label"]: a for a in arts}
+        return self._index
+
+    def get_lines(self, label):
+        """返回标签对应的文本行；条目可以内嵌 lines，也可以指向 file"""
+        if label in self._lines:
+            return self._lines[label]
+
+        entry = self._load_index().get(label)
+        if not entry:
+            if label not in self._missing:
+                print(f"[!] 未找到标签: {label}")
+                self._missing.add(label)
+            return None
+
+        if "lines" in entry:
+            lines = list(entry["lines"])
+        else:
+            with open(entry["file"], "r", encoding="utf-8") as f:
+                lines = [line.rstrip("\n") for line in f]
+        self._lines[label] = lines
+        return lines
+
+    def _get_font(self, font_size, use_freetype):
+        key = (font_size, use_freetype)
+        if key not in self._fonts:
+            if use_freetype:
+                if not pygame.freetype.get_init():
+                    pygame.freetype.init()
+                self._fonts[key] = pygame.freetype.Font(self.font_path, font_size)
+            else:
+                self._fonts[key] = pygame.font.Font(self.font_path, font_size)
+        return self._fonts[key]
+
+    def get_surface(self, label, font_size=16, color=(255, 255, 255), use_freetype=False):
+        """取出预渲染好的整张 ASCII art，找不到标签时返回 None"""
+        key = (label, font_size, tuple(color), use_freetype)
+        surface = self._surfaces.get(key)
+        if surface is None:
+            lines = self.get_lines(label)
+            if lines is None:
+                return None
+            surface = self._render(lines, font_size, tuple(color), use_freetype)
+            self._surfaces.put(key, surface)
+        return surface
+
+    def _render(self, lines, font_size, color, use_freetype):
+        font = self._get_font(font_size, use_freetype)
+        if use_freetype:
+            rendered = [font.render(line, color)[0] if line else None for line in lines]
+        else:
+            rendered = [font.render(line, False, color) for line in lines]  # False = 关闭抗锯齿
+        width = max((s.get_width() for s in rendered if s), default=1)
+        height = max(len(lines) * font_size, 1)
+
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        for i, line_surface in enumerate(rendered):
+            if line_surface:
+                surface.blit(line_surface, (0, i * font_size))
+        return surface
+
+    def draw(self, screen, label, font_size=16, x=10, y=20, color=(255, 255, 255), use_freetype=False):
+        surface = self.get_surface(label, font_size, color, use_freetype)
+        if surface is not None:
+            screen.blit(surface, (x, y))
+
+    def stats(self):
+        return self._surfaces.stats()
+
+
+# 全局共享的默认库
+default_library = AsciiArtLibrary()
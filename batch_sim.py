@@ -0,0 +1,411 @@
+# batch_sim.py
+# NumPy 批量对战模拟：N 场 1v1 战斗（玩家 vs 单个怪物）放在数组里一起推进，用来调 weapon_info / WEAPON_LIBRARY / MONSTER_LIBRARY
+# 规则与 combat.CombatEngine 一致（近战 pattern、射击、火球、冲刺、翻滚），不模拟刷怪、状态效果和连招加成
+# （默认 loadout 只带一把非初始武器，连招表里的组合不会出现）
+# check_against_engine 对每种怪物、武器组合、起始站位各跑一场，和 CombatEngine 的胜负、回合数、承受伤害逐项核对
+# 用法: python batch_sim.py [每组场数]    python batch_sim.py --check
+
+import sys
+import time
+import numpy as np
+from constants import BOARDSIZE
+from Weapon import weapon_info
+from Charactor import MONSTER_LIBRARY, WEAPON_LIBRARY
+
+PLAYER, ENEMY = 0, 1
+GRID_SIZE = BOARDSIZE + 1
+DEFAULT_BATTLES = 100000
+DEFAULT_MAX_TURNS = 200
+
+
+def on_board(pos):
+    return (pos >= 0) & (pos < GRID_SIZE)
+
+
+class WeaponSpec:
+    """模拟用的武器参数（只读）"""
+    def __init__(self, name, damage, pattern, cooldown, weapon_type, unique_in_sequence, range):
+        self.name = name
+        self.damage = damage
+        self.pattern = np.array(pattern, dtype=np.int16)
+        self.cooldown = cooldown
+        self.weapon_type = weapon_type
+        self.unique_in_sequence = unique_in_sequence
+        self.range = range
+
+    @classmethod
+    def from_info(cls, name):
+        w = weapon_info[name]
+        return cls(name, w["damage"], w["pattern"], w["cooldown"], w["weapon_type"],
+                   w["unique_in_sequence"], w.get("range", None))
+
+    @classmethod
+    def from_weapon(cls, weapon):
+        return cls(weapon.name, weapon.damage, weapon.pattern, weapon.cooldown, weapon.weapon_type,
+                   weapon.unique_in_sequence, weapon.range)
+
+
+class BatchBattle:
+    """
+    N 场独立战斗，每个字段都是长度 N 的数组
+    pos/dir/hp 的第一维是 [玩家, 怪物]；cd 为 (N, 武器数) 的冷却；seq 为 (N, 序列上限) 的已加入武器编号，-1 表示空
+    """
+    def __init__(self, monster_id, loadout=("Hello World",), n=DEFAULT_BATTLES, seed=None,
+                 player_health=100, sequence_limit=2):
+        rng = np.random.default_rng(seed)
+        data = MONSTER_LIBRARY[monster_id]
+        self.n = n
+        self.monster_id = monster_id
+        self.loadout = tuple(loadout)
+        self.monster_type = data["type"]
+
+        self.weapons = [
+            [WeaponSpec.from_info(name) for name in self.loadout],
+            [WeaponSpec.from_weapon(WEAPON_LIBRARY[name]) for name in data["weapons"]],
+        ]
+        names = [w.name for w in self.weapons[ENEMY]]
+        intents = [[names.index(name) for name in intent] for intent in data["intents"]]
+        self.intent_len = np.array([len(i) for i in intents], dtype=np.int16)
+        self.intents = np.full((len(intents), self.intent_len.max()), -1, dtype=np.int16)
+        for i, intent in enumerate(intents):
+            self.intents[i, :len(intent)] = intent
+
+        # 随机初始站位（互不重叠），朝向和 CombatEngine 一样都朝右
+        p = rng.integers(0, GRID_SIZE, n)
+        e = rng.integers(0, GRID_SIZE - 1, n)
+        e += e >= p
+        self.pos = np.stack([p, e]).astype(np.int16)
+        self.dir = np.ones((2, n), dtype=np.int16)
+        self.hp = np.array([np.full(n, player_health), np.full(n, data["health"])], dtype=np.int32)
+
+        limits = (sequence_limit, data["sequence_limit"])
+        self.cd = [np.zeros((n, len(self.weapons[a])), dtype=np.int16) for a in (PLAYER, ENEMY)]
+        self.seq = [np.full((n, limits[a]), -1, dtype=np.int16) for a in (PLAYER, ENEMY)]
+        self.seq_len = [np.zeros(n, dtype=np.int16) for _ in (PLAYER, ENEMY)]
+        self.swap_cooldown = np.zeros(n, dtype=np.int16)
+
+        # 怪物 AI 状态
+        self.intent_index = np.zeros(n, dtype=np.int16)
+        self.intent_progress = np.zeros(n, dtype=np.int16)
+        self.waiting = np.zeros(n, dtype=bool)
+        self.ready_to_attack = np.zeros(n, dtype=bool)
+        self.adding = np.zeros(n, dtype=bool)
+        self.moving = np.zeros(n, dtype=bool)
+
+        # 结果
+        self.turns = np.zeros(n, dtype=np.int32)
+        self.damage_taken = np.zeros(n, dtype=np.int32)
+
+    # ===== 基础操作 =====
+    def alive(self):
+        return (self.hp[PLAYER] > 0) & (self.hp[ENEMY] > 0)
+
+    def facing(self, a):
+        return (self.pos[1 - a] - self.pos[a]) * self.dir[a] > 0
+
+    def hit(self, who, mask, damage):
+        """和 Actor 一样血量扣到 0 为止，damage_taken 只算实际扣掉的部分"""
+        hp = self.hp[who]
+        taken = np.minimum(hp[mask], damage)
+        hp[mask] -= taken
+        if who == PLAYER:
+            self.damage_taken[mask] += taken
+
+    def try_add(self, a, weapon_index, mask):
+        """对应 Actor.try_add_weapon_to_sequence，weapon_index 可以是标量或数组"""
+        seq, seq_len, cd = self.seq[a], self.seq_len[a], self.cd[a]
+        rows = np.arange(self.n)
+        j = np.broadcast_to(np.asarray(weapon_index, dtype=np.int16), (self.n,))
+        jc = np.maximum(j, 0)
+        unique = np.array([w.unique_in_sequence for w in self.weapons[a]])[jc]
+        in_seq = (seq == j[:, None]).any(axis=1)
+        ok = mask & (j >= 0) & (seq_len < seq.shape[1]) & (cd[rows, jc] == 0) & ~(unique & in_seq)
+        idx = np.nonzero(ok)[0]
+        seq[idx, seq_len[idx]] = j[idx]
+        seq_len[idx] += 1
+        return ok
+
+    def execute_sequence(self, a, mask):
+        """对应 Actor.execute_sequence + CombatEngine.execute_actions"""
+        seq, cd = self.seq[a], self.cd[a]
+        executed = np.full(seq.shape, -1, dtype=np.int16)
+        for s in range(seq.shape[1]):
+            for j, weapon in enumerate(self.weapons[a]):
+                use = mask & (seq[:, s] == j) & (cd[:, j] == 0)
+                cd[use, j] = weapon.cooldown
+                executed[use, s] = j
+        seq[mask] = -1
+        self.seq_len[a][mask] = 0
+
+        for s in range(seq.shape[1]):
+            for j, weapon in enumerate(self.weapons[a]):
+                m = mask & (executed[:, s] == j) & self.alive()
+                if m.any():
+                    self.resolve(a, weapon, m)
+
+    def tick_cooldowns(self, a, mask):
+        cd = self.cd[a]
+        cd[mask] = np.maximum(cd[mask] - 1, 0)
+
+    # ===== 武器结算（对应 CombatEngine.resolve_weapon） =====
+    def resolve(self, a, weapon, m):
+        t = 1 - a
+        kind = weapon.weapon_type
+        if kind == "melee":
+            self.attack_by_pattern(a, weapon, m)
+        elif kind == "ranged":
+            self.hit(t, m & self.facing(a), weapon.damage)
+        elif kind == "fireball":
+            has = m & self.facing(a)
+            center = self.pos[t]
+            if (weapon.pattern == 0).any():
+                self.hit(t, has, weapon.damage)
+            self.hit(a, has & np.isin(self.pos[a] - center, weapon.pattern), weapon.damage)
+        elif kind == "dash_to_enemy":
+            self.dash(a, weapon, m)
+        elif kind == "roll":
+            self.roll(weapon, m)
+        # random 等未实现的类型在 CombatEngine 里也没有效果
+
+    def attack_by_pattern(self, a, weapon, m):
+        t = 1 - a
+        rel = (self.pos[t] - self.pos[a]) * self.dir[a]
+        self.hit(t, m & np.isin(rel, weapon.pattern) & on_board(self.pos[t]), weapon.damage)
+        if (weapon.pattern == 0).any():
+            self.hit(a, m & on_board(self.pos[a]), weapon.damage)
+
+    def dash(self, a, weapon, m):
+        t = 1 - a
+        has = self.facing(a)
+        miss = m & ~has
+        self.pos[a][miss] = np.clip(self.pos[a][miss] + self.dir[a][miss] * weapon.range, 0, GRID_SIZE - 1)
+
+        # 和 CombatEngine 一样按玩家位置算距离
+        distance = np.abs(self.pos[t] - self.pos[PLAYER])
+        go = m & has & (distance <= weapon.range)
+        self.pos[a][go] = self.pos[t][go] - self.dir[a][go]
+        self.attack_by_pattern(a, weapon, go)
+        kill = go & (self.hp[t] <= 0)
+        self.pos[a][kill] = self.pos[t][kill]
+
+    def roll(self, weapon, m):
+        # 与 CombatEngine.get_roll_target 保持一致：向左翻滚不造成伤害，敌人在 0 号格时没有落点
+        p, e = self.pos[PLAYER], self.pos[ENEMY]
+        right = m & (self.dir[PLAYER] == 1) & (e > p) & (e + 1 <= BOARDSIZE)
+        left = m & (self.dir[PLAYER] == -1) & (e < p) & (e > 0)
+        self.hit(ENEMY, right, weapon.damage)
+        self.pos[PLAYER][right] = e[right] + 1
+        self.pos[PLAYER][left] = e[left] - 1
+        self.move_player(m & ~right & ~left, 1)
+
+    def move_player(self, m, offset):
+        """对应 handle_move：撞上怪物时换位（有冷却）"""
+        new_pos = self.pos[PLAYER] + offset
+        swap = m & (new_pos == self.pos[ENEMY]) & (self.swap_cooldown == 0)
+        self.pos[ENEMY][swap] = self.pos[PLAYER][swap]
+        self.swap_cooldown[swap] = 4
+        step = m & (new_pos != self.pos[ENEMY]) & on_board(new_pos)
+        self.pos[PLAYER][step | swap] = new_pos[step | swap]
+
+    # ===== 回合 =====
+    def player_turn(self, m):
+        """combat.simple_policy 的向量化版本：面向敌人 → 加武器 → 放连招"""
+        turn = m & ~self.facing(PLAYER)
+        self.dir[PLAYER][turn] *= -1
+
+        rest = m & ~turn
+        added = np.zeros(self.n, dtype=bool)
+        room = rest & (self.seq_len[PLAYER] < self.seq[PLAYER].shape[1])
+        for j in range(len(self.weapons[PLAYER])):
+            added |= self.try_add(PLAYER, j, room & ~added)
+
+        execute = rest & ~added & (self.seq_len[PLAYER] > 0)
+        self.execute_sequence(PLAYER, execute)
+
+        # end_player_turn：和 CombatEngine 一样，第 50 回合起打死最后一个敌人直接结束，这一回合不计数
+        over = m & (self.hp[ENEMY] <= 0) & (self.turns >= 50)
+        m = m & ~over
+        self.tick_cooldowns(PLAYER, m)
+        self.swap_cooldown[m] = np.maximum(self.swap_cooldown[m] - 1, 0)
+        self.turns[m] += 1
+
+    def enemy_turn(self, m):
+        """Enemy.ai_take_turn 的向量化版本"""
+        waiting = m & self.waiting
+        ready = m & ~self.waiting & self.ready_to_attack
+        other = m & ~self.waiting & ~self.ready_to_attack
+
+        can_hit = waiting & self.can_hit_player()
+        self.waiting[can_hit] = False
+        self.ready_to_attack[can_hit] = True
+        blocked = waiting & ~can_hit
+        turn = blocked & ~self.facing(ENEMY)
+        self.dir[ENEMY][turn] *= -1
+        move = blocked & ~turn & self.moving
+        new_pos = self.pos[ENEMY] + self.dir[ENEMY]
+        step = move & on_board(new_pos) & (new_pos != self.pos[PLAYER])
+        self.pos[ENEMY][step] = new_pos[step]
+        self.moving[move] = False
+        self.moving[blocked & ~turn & ~move] = True
+
+        self.execute_sequence(ENEMY, ready)
+        self.ready_to_attack[ready] = False
+
+        start_adding = other & ~self.adding
+        self.execute_intent(other & self.adding)
+        self.adding[start_adding] = True
+
+        # end_enemy_turn
+        self.tick_cooldowns(ENEMY, m)
+
+    def can_hit_player(self):
+        distance = np.abs(self.pos[ENEMY] - self.pos[PLAYER])
+        if self.monster_type == "melee":
+            reach = 1
+        else:
+            ranges = np.array([w.range or 1 for w in self.weapons[ENEMY]])
+            reach = ranges[np.maximum(self.seq[ENEMY][:, 0], 0)]
+        return self.facing(ENEMY) & (distance <= reach)
+
+    def execute_intent(self, m):
+        current_len = self.intent_len[self.intent_index]
+        in_progress = self.intent_progress < current_len
+        weapon_index = self.intents[self.intent_index, np.minimum(self.intent_progress, self.intents.shape[1] - 1)]
+        ok = self.try_add(ENEMY, weapon_index, m & in_progress)
+        self.intent_progress[ok] += 1
+        self.waiting[ok & (self.intent_progress == current_len)] = True
+        self.adding[ok] = False
+
+        done = m & ~in_progress
+        self.intent_progress[done] = 0
+        self.intent_index[done] = (self.intent_index[done] + 1) % len(self.intent_len)
+        return ok
+
+    def run(self, max_turns=DEFAULT_MAX_TURNS):
+        for _ in range(max_turns):
+            active = self.alive()
+            if not active.any():
+                break
+            self.player_turn(active)
+            self.enemy_turn(self.alive())
+        return self.result()
+
+    def result(self):
+        won = self.hp[ENEMY] <= 0
+        lost = self.hp[PLAYER] <= 0
+        return {
+            "monster": self.monster_id,
+            "loadout": self.loadout,
+            "won": won,
+            "lost": lost,
+            "turns": self.turns,
+            "damage_taken": self.damage_taken,
+        }
+
+
+def summarize(result):
+    """胜率、击杀回合数、承受伤害的统计"""
+    won, turns, damage = result["won"], result["turns"], result["damage_taken"]
+    kill_turns = turns[won]
+    return {
+        "monster": result["monster"],
+        "loadout": result["loadout"],
+        "battles": len(won),
+        "win_rate": float(won.mean()),
+        "loss_rate": float(result["lost"].mean()),
+        "turns_mean": float(kill_turns.mean()) if len(kill_turns) else None,
+        "turns_p50": float(np.percentile(kill_turns, 50)) if len(kill_turns) else None,
+        "turns_p90": float(np.percentile(kill_turns, 90)) if len(kill_turns) else None,
+        "turns_hist": np.bincount(kill_turns),
+        "damage_mean": float(damage.mean()),
+        "damage_p90": float(np.percentile(damage, 90)),
+        "damage_hist": np.bincount(damage),
+    }
+
+
+def simulate(monster_id, loadout=("Hello World",), n=DEFAULT_BATTLES, seed=None,
+             max_turns=DEFAULT_MAX_TURNS, **kwargs):
+    return summarize(BatchBattle(monster_id, loadout, n, seed, **kwargs).run(max_turns))
+
+
+def default_loadouts():
+    """初始武器 Hello World + 任意一把其他武器；策略按顺序优先使用，所以新武器放在前面"""
+    return [("Hello World",)] + [(name, "Hello World") for name in weapon_info if name != "Hello World"]
+
+
+def sweep(monsters=None, loadouts=None, n=DEFAULT_BATTLES, seed=0, max_turns=DEFAULT_MAX_TURNS):
+    """每个 (怪物, 武器组合) 跑 n 场"""
+    monsters = monsters or list(MONSTER_LIBRARY)
+    loadouts = loadouts or default_loadouts()
+    return [simulate(m, l, n, seed, max_turns) for m in monsters for l in loadouts]
+
+
+def engine_battle(monster_id, loadout, player_pos, enemy_pos, max_turns=DEFAULT_MAX_TURNS):
+    """用 CombatEngine 跑同一场 1v1（不刷怪，simple_policy），返回 (胜, 回合数, 承受伤害)"""
+    from combat import CombatEngine, simple_policy
+    from Charactor import Enemy
+
+    engine = CombatEngine(seed=0, enemy_count=0, wave_interval=0)
+    engine.player.position = player_pos
+    engine.player.weapons = []
+    for name in loadout:
+        engine.player.unlock_weapon(name)
+    enemy = Enemy(monster_id, enemy_pos)
+    enemy.on_move_check = engine.handle_move
+    engine.add_enemy(enemy)
+    while engine.game_state != "game_over" and engine.enemies and engine.turn_count < max_turns:
+        acted, _ = engine.player_action(simple_policy(engine))
+        if not acted:
+            engine.player_action("wait")
+    return not engine.enemies, engine.turn_count, engine.player.max_health - engine.player.health
+
+
+def check_against_engine(player_pos=2, max_turns=DEFAULT_MAX_TURNS):
+    """
+    每个 (怪物, 默认武器组合, 怪物起始位置) 各跑一场，和 CombatEngine 的结果逐项比较
+    返回 (总场数, 不一致的列表)
+    """
+    cases = 0
+    mismatches = []
+    for monster_id in MONSTER_LIBRARY:
+        for loadout in default_loadouts():
+            for enemy_pos in range(GRID_SIZE):
+                if enemy_pos == player_pos:
+                    continue
+                battle = BatchBattle(monster_id, loadout, n=1)
+                battle.pos[:, 0] = (player_pos, enemy_pos)
+                r = battle.run(max_turns)
+                batch = (bool(r["won"][0]), int(r["turns"][0]), int(r["damage_taken"][0]))
+                engine = engine_battle(monster_id, loadout, player_pos, enemy_pos, max_turns)
+                cases += 1
+                if batch != engine:
+                    mismatches.append((monster_id, loadout, enemy_pos, batch, engine))
+    return cases, mismatches
+
+
+def print_table(rows):
+    print(f"{'monster':<8}{'loadout':<42}{'win%':>7}{'turns':>8}{'p90':>6}{'dmg':>8}{'p90':>6}")
+    for r in rows:
+        turns = f"{r['turns_mean']:.1f}" if r["turns_mean"] is not None else "-"
+        p90 = f"{r['turns_p90']:.0f}" if r["turns_p90"] is not None else "-"
+        print(f"{r['monster']:<8}{' + '.join(r['loadout']):<42}{r['win_rate'] * 100:>6.1f}%"
+              f"{turns:>8}{p90:>6}{r['damage_mean']:>8.1f}{r['damage_p90']:>6.0f}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--check"]:
+        total = failed = 0
+        for player_pos in range(GRID_SIZE):
+            cases, mismatches = check_against_engine(player_pos)
+            total += cases
+            failed += len(mismatches)
+            for mismatch in mismatches:
+                print("mismatch", player_pos, *mismatch)
+        print(f"checked {total} battles against CombatEngine, {failed} mismatches")
+        sys.exit(1 if failed else 0)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BATTLES
+    start = time.perf_counter()
+    rows = sweep(n=n)
+    elapsed = time.perf_counter() - start
+    print_table(rows)
+    print(f"{len(rows) * n} battles in {elapsed:.2f}s")
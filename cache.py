@@ -0,0 +1,109 @@
+# cache.py
+# 通用的有界 LRU 缓存：图片、染色精灵、文字等渲染资源共用
+
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    按最近使用顺序淘汰的缓存
+    max_items: 最多条目数（None 表示不限）
+    max_bytes: 估算内存上限（None 表示不限），需要配合 sizeof 使用
+    sizeof: 计算单个值占用字节数的函数
+    on_evict: 条目被淘汰时的回调 on_evict(key, value)
+    """
+    def __init__(self, max_items=256, max_bytes=None, sizeof=None, on_evict=None):
+        self._data = OrderedDict()
+        self._sizes = {}
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.on_evict = on_evict
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def keys(self):
+        return list(self._data.keys())
+
+    def get(self, key, default=None):
+        """命中时把条目移到最新位置"""
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if key in self._data:
+            self._remove(key)
+        size = self.sizeof(value) if self.sizeof else 0
+        self._data[key] = value
+        self._sizes[key] = size
+        self.current_bytes += size
+        self._shrink()
+        return value
+
+    def get_or_create(self, key, factory):
+        """缓存未命中时调用 factory() 生成并存入"""
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return self.put(key, factory())
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def discard(self, key):
+        """主动移除（不触发 on_evict）"""
+        if key in self._data:
+            self._remove(key)
+
+    def clear(self):
+        self._data.clear()
+        self._sizes.clear()
+        self.current_bytes = 0
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "items": len(self._data),
+            "bytes": self.current_bytes,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def _remove(self, key):
+        value = self._data.pop(key)
+        self.current_bytes -= self._sizes.pop(key)
+        return value
+
+    def _shrink(self):
+        # 至少保留最新的一项，避免单个大对象被立刻淘汰
+        while len(self._data) > 1 and (
+            (self.max_items is not None and len(self._data) > self.max_items)
+            or (self.max_bytes is not None and self.current_bytes > self.max_bytes)
+        ):
+            key = next(iter(self._data))
+            value = self._remove(key)
+            self.evictions += 1
+            if self.on_evict:
+                self.on_evict(key, value)
@@ -1,26 +1,52 @@
-# 颜色定义（1bit风格）
-BLACK = (0, 0, 0)
-WHITE = (255, 255, 255)
-GREEN = (100, 220, 100)
-GRAY = (100, 100, 100)
-SHADOW = (50, 50, 50)
-RED = (220, 20, 60)
-
-BOARDSIZE=8
-
-SCREEN_WIDTH = 1080
-SCREEN_HEIGHT = 720
-TOOLBAR_HEIGHT = 60
+# 颜色、棋盘尺寸等常量在 constants.py（不依赖 pygame）
+from constants import *
 
 import pygame
 import os
 import json
 from font_manager import get_font
 
+from cache import LRUCache
+import ascii_art
+
 # 全局集合，记录已经提示过的缺失图片
 _missing_logged = set()
 
-def load_image(path, scale=None, fallback="arts/sprite/Character/enemy.png"):
+IMAGE_CACHE_MAX_ITEMS = 256
+IMAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 约 64MB
+
+def _surface_bytes(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+# 图片缓存：(路径, 缩放尺寸, 是否水平翻转) -> Surface
+_image_cache = LRUCache(max_items=IMAGE_CACHE_MAX_ITEMS, max_bytes=IMAGE_CACHE_MAX_BYTES, sizeof=_surface_bytes)
+
+def load_image(path, scale=None, fallback="arts/sprite/Character/enemy.png", flip=False):
+    """
+    带缓存的图片加载，同一 (path, scale, flip, fallback) 只读盘一次
+    flip=True 返回水平翻转后的版本（朝左的角色）
+    返回的 Surface 是共享的，调用方不要直接修改它
+    """
+    key = (path, tuple(scale) if scale else None, flip, fallback)
+    image = _image_cache.get(key)
+    if image is None:
+        if flip:
+            image = pygame.transform.flip(load_image(path, scale, fallback), True, False)
+        else:
+            image = _load_image_from_disk(path, scale, fallback)
+        _image_cache.put(key, image)
+    return image
+
+def get_image_cache_stats():
+    """图片缓存命中情况，misses 即实际读盘次数"""
+    return _image_cache.stats()
+
+def clear_image_cache():
+    _image_cache.clear()
+    _tint_cache.clear()
+    _tints_by_source.clear()
+
+def _load_image_from_disk(path, scale=None, fallback=None):
     if not os.path.exists(path):
         if path not in _missing_logged:
             print(f"[警告] 找不到图片: {path}")
@@ -54,38 +80,57 @@ def load_image(path, scale=None, fallback="arts/sprite/Character/enemy.png"):
         surf.fill((255, 0, 0, 128))  # 半透明红色方块占位
         return surf
 
+TINT_CACHE_MAX_ITEMS = 512
+TINT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# 染色缓存：(源 Surface, 颜色) -> 染色后的 Surface
+_tint_cache = LRUCache(max_items=TINT_CACHE_MAX_ITEMS, max_bytes=TINT_CACHE_MAX_BYTES, sizeof=_surface_bytes)
+# 源 Surface -> 它的染色缓存键，淘汰源图片时不用扫整个染色缓存
+_tints_by_source = {}
+
+def _forget_tints(key, source):
+    """源图片被淘汰时，一并丢掉它的染色版本"""
+    for tint_key in _tints_by_source.pop(source, ()):
+        _tint_cache.discard(tint_key)
+
+def _unindex_tint(tint_key, tinted):
+    """染色版本自己被淘汰时，从索引里去掉"""
+    keys = _tints_by_source.get(tint_key[0])
+    if keys is not None:
+        keys.discard(tint_key)
+        if not keys:
+            del _tints_by_source[tint_key[0]]
+
+_image_cache.on_evict = _forget_tints
+_tint_cache.on_evict = _unindex_tint
+
+def get_tinted(image, color):
+    """返回染色后的 Surface（共享缓存，不要修改）"""
+    key = (image, tuple(color[:3]))
+    tinted = _tint_cache.get(key)
+    if tinted is None:
+        tinted = image.convert_alpha()  # convert_alpha 本身会返回新的 Surface
+        # alpha 保持原图
+        tinted.fill(key[1] + (255,), special_flags=pygame.BLEND_RGBA_MULT)
+        _tint_cache.put(key, tinted)
+        _tints_by_source.setdefault(image, set()).add(key)
+    return tinted
+
+def get_tint_cache_stats():
+    return _tint_cache.stats()
+
 def render_1bit_sprite(screen, image, pos, color):
         """
         渲染 1bit 精灵图并染色
         image: pygame.Surface (白色前景 + 透明背景 PNG)
         color: (R,G,B)
+        同一张图同一种颜色只染色一次，之后直接复用缓存
         """
-        base = image.convert_alpha()
-        tinted = base.copy()
-        # alpha 保持原图
-        tinted.fill(color + (255,), special_flags=pygame.BLEND_RGBA_MULT)
-        screen.blit(tinted, pos)
+        screen.blit(get_tinted(image, color), pos)
 
 def render_ascii_art(screen, label, font_size=16, x=10, y=20, color=WHITE):
-    # 加载 ASCII art 索引
-    with open("ASCII.json", "r", encoding="utf-8") as f:
-        arts = json.load(f)
-
-    # 查找对应标签
-    art_entry = next((a for a in arts if a["label"] == label), None)
-    if not art_entry:
-        print(f"[!] 未找到标签: {label}")
-        return
-
-    # 从文件加载 ASCII 内容
-    with open(art_entry["file"], "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    # 渲染
-    font = pygame.font.Font("Saitamaar-Regular.ttf", font_size)
-    for i, line in enumerate(lines):
-        text_surface = font.render(line.rstrip("\n"), False, color)  # False = 关闭抗锯齿
-        screen.blit(text_surface, (x, y + i * font_size))
+    """绘制 ASCII art：首次使用时渲染成一张 Surface，之后每帧只是一次 blit"""
+    ascii_art.default_library.draw(screen, label, font_size=font_size, x=x, y=y, color=color)
 
 TAB_WIDTH = 220
 TAB_HEIGHT = 40
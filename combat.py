@@ -0,0 +1,800 @@
+# combat.py
+# 无界面的战斗核心：棋盘、角色、武器、状态和回合结算，不依赖 pygame
+# FightScene 只负责渲染和把按键翻译成 player_action；批量模拟/测试可以直接驱动 CombatEngine
+
+import random
+import time
+import logging
+from constants import *
+from Charactor import *
+from position_index import PositionIndex
+from footprint import footprint, iter_bits, range_mask
+from turn_scheduler import TurnScheduler
+from enemy_ai import default_ai
+from entity_store import EntityStore, StoredEnemy, FLAG_ALIVE, FLAG_WAITING, FLAG_READY, FLAG_ADDING, FLAG_MOVING
+from danger_map import DangerMap
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGES = 50  # 消息队列上限，无界面长时间运行时不无限增长
+HORDE_GRID_SIZE = 1000   # horde 模式：超长棋盘 + 大量敌人，run_battle(grid_size=..., enemy_count=...)
+HORDE_ENEMY_COUNT = 300
+
+
+def _default_clock():
+    return int(time.monotonic() * 1000)
+
+
+def _run_now(callback, duration=None):
+    callback()
+
+
+def _pause():
+    pass
+
+
+class CombatEngine:
+    """
+    schedule(callback, duration): 武器结算等步骤的执行方式，默认立即执行；界面模式传入时间轴
+    clock(): 消息时间戳（毫秒）
+    round_delay: 玩家回合结束到敌人行动之间的停顿（毫秒），交给 schedule 处理；无界面/快速模式为 0
+    ai_mode: "intent" 固定意图轮换（默认），"utility" 效用打分（见 enemy_ai）
+    entity_store: True 时敌人的位置/血量/朝向/标记/冷却存在 EntityStore 的数组里（见 entity_store），适合超多敌人
+    speculator: speculation.Speculator，玩家思考时后台推演敌人阶段，玩家行动后直接采用（可在多个引擎间复用）
+    """
+    def __init__(self, seed=None, rng=None, schedule=None, clock=None, round_delay=0,
+                 grid_size=BOARDSIZE + 1, enemy_count=1, ai_mode=ENEMY_AI_MODE,
+                 wave_interval=WAVE_INTERVAL, wave_size=WAVE_SIZE, entity_store=False, speculator=None):
+        self._rng = rng or random.Random(seed)
+        self._rng_state = None   # 复制时取下的随机数状态，_rng 为 None 时第一次用到再从它重建
+        self.schedule = schedule or _run_now
+        self.clock = clock or _default_clock
+        self.round_delay = round_delay
+        self.ai_mode = ai_mode
+        self.ai = default_ai
+
+        self.grid_size = grid_size  # 格子数，horde 模式可以开到上千格
+        self.wave_interval = wave_interval
+        self.wave_size = wave_size
+
+        # 玩家和敌人
+        self.player = Player()  # 开始在中间位置
+        self.enemies = []
+        self.enemy_index = PositionIndex()  # 敌人位置索引，随移动/换位/刷怪/死亡更新
+        self.turn_order = TurnScheduler()   # 敌人的行动顺序
+        self.entity_store = EntityStore() if entity_store else None
+        self.pending_hits = []   # 本步还没结算的命中 (目标, 武器)
+        self.danger = DangerMap(self.grid_size)   # 下个敌人阶段每格的预计伤害，用 get_danger() 读
+        self._removing = None    # 死亡结算中待删除的敌人
+        for _ in range(enemy_count):
+            self.spawn_enemy()
+
+        # 游戏状态
+        self.game_state = "player_turn"  # player_turn, enemy_turn, game_over
+        self.turn_count = 0
+        self.messages = []  # 队列，最新的消息插入末尾
+        self.message_count = 0  # 累计加过的消息数（messages 会截断，用它定位某一段新消息）
+        self.enemy_turn_pending = False
+
+        # 预测：玩家思考时后台推演每种行动的整轮结果（见 speculation），敌人阶段直接采用
+        self.speculator = None
+        self.round_id = 0             # 每开始一个玩家回合加一
+        self.committed_action = None  # 本回合玩家实际做出的行动
+        self.enemy_phase_mark = 0     # 敌人阶段开始时的 message_count
+
+        self.player.on_move_check = self.handle_move#回调函数绑定
+        self.player.on_position_change = self._player_moved
+        self.player.on_change = self._player_changed
+
+        if speculator is not None:
+            self.speculator = speculator
+            self.begin_player_turn()
+
+    @property
+    def rng(self):
+        if self._rng is None:
+            self._rng = random.Random.__new__(random.Random)
+            self._rng.setstate(self._rng_state)
+        return self._rng
+
+    @rng.setter
+    def rng(self, value):
+        self._rng = value
+        self._rng_state = None
+
+    def _share_rng_state(self):
+        """
+        取下当前随机数状态给副本用，本引擎和副本都等到真正用 rng 时才各自重建
+        搜索时同一个局面连续复制好几个副本，状态只取一次；大多数副本一直用不到 rng，就不用重建
+        后台推演复制真实局面时主线程在 wait_snapshot 之前不会用 rng，所以改本引擎的 _rng 也安全
+        """
+        if self._rng is not None:
+            self._rng_state = self._rng.getstate()
+            self._rng = None
+        return self._rng_state
+
+    def clone(self):
+        """
+        复制整场战斗的状态（随机数状态也一起复制），用于搜索和预测
+        副本总是立即结算（无时间轴、无停顿），不带消息记录
+        """
+        c = object.__new__(CombatEngine)
+        c.__dict__.update(self.__dict__)
+        c._rng, c._rng_state = None, self._share_rng_state()
+        c.schedule = _run_now
+        c.round_delay = 0
+        c.messages = []
+        c.pending_hits = []
+        c.speculator = None
+        c.danger = DangerMap(self.grid_size)
+
+        c.player = self.player.clone()
+        c.player.on_move_check = c.handle_move
+        c.player.on_position_change = c._player_moved
+        c.player.on_change = None
+        c.enemies = []
+        c.enemy_index = PositionIndex()
+        # 有仓库时先复制仓库，敌人副本直接落到新仓库里，不会写回原来的
+        store = self.entity_store.copy() if self.entity_store is not None else None
+        mapping = {}
+        for enemy in self.enemies:
+            e = enemy.clone(store) if isinstance(enemy, StoredEnemy) else enemy.clone()
+            e.on_move_check = c.handle_move
+            e.on_position_change = c._enemy_moved
+            c.enemies.append(e)
+            c.enemy_index.add(e)
+            mapping[enemy] = e
+        c.turn_order = self.turn_order.copy(mapping)
+        if store is not None:
+            store.remap(mapping)
+            c.entity_store = store
+        return c
+
+    def add_message(self, text, color=WHITE, duration=2000):
+        self.messages.append({
+            "text": text,
+            "color": color,
+            "time": self.clock(),
+            "duration": duration,
+            "alpha": 255
+        })
+        if len(self.messages) > MAX_MESSAGES:
+            del self.messages[0]
+        self.message_count += 1
+
+    def player_action(self, action):
+        """
+        玩家行动，action 为 "left" / "right" / "turn" / "wait" / "execute" 或武器编号（从 0 开始）
+        返回 (是否消耗了回合, 提示消息或 None)
+        """
+        if self.game_state != "player_turn":
+            return False, None
+        if self.speculator is not None:
+            self.speculator.wait_snapshot()   # 后台还在复制当前局面时先等它复制完
+        self.committed_action = action   # 没生效的行动不改变局面，下一次会覆盖
+
+        if action == "left" or action == "right":
+            if self.player.move(-1 if action == "left" else 1):
+                self.end_player_turn()
+                return True, None
+            return False, None
+        elif action == "turn":
+            self.player.turn_around()
+            self.end_player_turn()
+            return True, None
+        elif action == "wait":
+            self.end_player_turn()
+            return True, None
+        elif action == "execute":
+            if self.player.action_sequence:
+                self.execute_actions(self.player)
+                self.schedule(self.end_player_turn, 0)  # 连招结算完再结束回合
+                return True, None
+            return False, "Empty Sequence!"
+        elif isinstance(action, int):
+            success, msg = self.player.try_add_weapon_to_sequence(action,self)
+            if success:
+                self.end_player_turn()
+            return success, msg
+        raise ValueError(f"未知的玩家行动: {action}")
+
+    def player_actions(self):
+        """当前可能生效的玩家行动（先执行和加武器，再移动/转身/等待）"""
+        player = self.player
+        options = ["execute"] if player.action_sequence else []
+        if player.sequence_length < player.sequence_limit:
+            options.extend(i for i in range(len(player.weapons)) if player.cooldowns[i] == 0)
+        options.extend(("left", "right", "turn", "wait"))
+        return options
+
+    def begin_player_turn(self):
+        """新的玩家回合开始：有预测器就让它从当前局面开始推演"""
+        self.round_id += 1
+        if self.speculator is not None:
+            self.speculator.start(self, self.speculation_key())
+
+    def speculation_key(self):
+        """推演结果只在同一个玩家回合、且玩家没有在战斗外被改过时有效"""
+        return self.round_id, self.player.version
+
+    def _player_changed(self, player):
+        """玩家的 on_change：回合中途解锁了武器/技能等，之前的推演作废，从新局面重新推演"""
+        if self.speculator is not None and self.game_state == "player_turn":
+            self.speculator.start(self, self.speculation_key())
+
+    def adopt(self, other):
+        """
+        采用从本局面推演出来的副本的结果（整轮已结算完）
+        保留本引擎的时间轴、时钟、消息和预测器，副本里敌人阶段产生的消息补进来
+        """
+        keep = {name: self.__dict__[name] for name in
+                ("schedule", "clock", "round_delay", "messages", "message_count", "speculator")}
+        new_messages = other.messages[-(other.message_count - other.enemy_phase_mark):] \
+            if other.message_count > other.enemy_phase_mark else []
+        self.__dict__.update(other.__dict__)
+        self.__dict__.update(keep)
+        self.player.on_move_check = self.handle_move
+        self.player.on_position_change = self._player_moved
+        self.player.on_change = self._player_changed
+        for enemy in self.enemies:
+            enemy.on_move_check = self.handle_move
+            enemy.on_position_change = self._enemy_moved
+        self.danger.mark_all()
+        for message in new_messages:
+            self.add_message(message["text"], message["color"], message["duration"])
+        if self.game_state == "player_turn":
+            self.begin_player_turn()
+
+    def add_enemy(self, enemy):
+        enemy.ai_mode = self.ai_mode
+        enemy.on_move_check = self.handle_move
+        enemy.on_position_change = self._enemy_moved
+        self.enemies.append(enemy)
+        self.enemy_index.add(enemy)
+        self.turn_order.add(enemy)
+        self.danger.moved(enemy)   # 新单位可能挡在别的敌人和目标之间
+
+    def remove_enemy(self, enemy):
+        if self._removing is not None:
+            self._removing.add(enemy)   # 死亡结算中，结束时统一从列表删除
+        elif enemy in self.enemies:
+            self.enemies.remove(enemy)
+        self.enemy_index.remove(enemy)
+        self.turn_order.remove(enemy)
+        self.danger.forget(enemy)
+        enemy.on_position_change = None
+        if isinstance(enemy, StoredEnemy):
+            enemy.detach()   # swap-remove 出仓库
+
+    def _enemy_moved(self, enemy, old_pos, new_pos):
+        """敌人的 on_position_change：更新位置索引，危险图标脏"""
+        self.enemy_index.move(enemy, old_pos, new_pos)
+        self.danger.moved(enemy)
+
+    def _player_moved(self, player, old_pos, new_pos):
+        self.danger.moved()
+
+    def get_pawn_at(self, pos, pawn_type="enemy"):
+        if pawn_type in ("player", "all") and self.player and self.player.position == pos:
+            return self.player
+        if pawn_type in ("enemy", "all"):
+            return self.enemy_index.get(pos)
+        return None
+    
+    def get_enemy_positions(self):
+        """返回已排序的敌人位置（索引里的列表，只读）"""
+        return self.enemy_index.positions
+    
+    def get_closest_pawn(self, source_position , max_range=None, direction=None, pawn_type="enemy"):
+        """
+        从整个战场中找最近的单位（direction: 1 右边 / -1 左边 / None 两边）
+        :return: 最近的 pawn 或 None
+        """
+        closest = None
+        if pawn_type in ("player", "all") and self.player:
+            offset = self.player.position - source_position
+            if direction is None or offset * direction > 0:
+                closest = self.player
+
+        if pawn_type in ("enemy", "all"):
+            nearest = self.enemy_index.nearest_positions(source_position, direction)
+            # 距离相同时玩家优先，敌人之间按加入顺序（和 self.enemies 里的先后一致，调度器里已经记着序号）
+            if nearest and (closest is None or abs(nearest[0] - source_position) < abs(closest.position - source_position)):
+                pawns = self.enemy_index.get_all(nearest[0])
+                if len(nearest) > 1:
+                    pawns += self.enemy_index.get_all(nearest[1])
+                closest = pawns[0] if len(pawns) == 1 else min(pawns, key=self.turn_order.order_of)
+
+        # 射程判定
+        if closest is not None and max_range is not None and abs(closest.position - source_position) > max_range:
+            return None
+
+        return closest
+    
+    def can_see(self,pawn1,pawn2):
+        # 视线判定：两者之间没有其他单位阻挡
+        a, b = pawn1.position, pawn2.position
+        if a == b:
+            return True
+        return not self.enemy_index.any_between(min(a, b), max(a, b))
+
+
+ 
+    def handle_move(self, actor, new_pos):
+        enemy = self.get_pawn_at(new_pos,"enemy")
+
+        if enemy:#面前为敌人
+            # 只有玩家可以换位，且要检查冷却
+            if isinstance(actor, Player) and actor.swap_cooldown == 0:
+                # 执行换位
+                enemy.position, actor.position = actor.position, enemy.position
+                actor.swap_cooldown = 4  # 重置换位冷却
+                return actor.position  # 玩家位置更新后返回新位置
+            else:
+                # 敌人不能换位，玩家换位冷却中也不能换位
+                return None
+        else:
+            if 0 <= new_pos < self.grid_size and self.player.position!=new_pos:#防止怪物跑到玩家脸上
+                return new_pos
+            else:
+                return None
+
+    def print_executed_actions(self,executed_actions):
+        """
+        输出 executed_actions 列表内容（debug 日志），用 -> 分隔
+        executed_actions: [(index, weapon), ...]
+        """
+        if not executed_actions:
+            logger.debug("No actions executed.")
+            return
+
+        logger.debug("->".join(f"{weapon.name}({index})" for index, weapon, _ in executed_actions))
+
+
+    def execute_actions(self,actor):
+        """执行序列：每个武器作为一个步骤交给 schedule 逐个结算"""
+        executed_actions = actor.execute_sequence()   # 已按 actor.battle_style 排好执行顺序
+        self.print_executed_actions(executed_actions)
+
+        for weapon_index, weapon, bonus in executed_actions:
+            self.schedule(lambda weapon=weapon, bonus=bonus: self.resolve_weapon(actor, weapon, bonus))
+
+    def resolve_weapon(self, actor, weapon, bonus=0):
+        """结算单个武器的效果，bonus 是连招收尾的额外伤害比例"""
+        multiplier = actor.damage_multiplier * (1 + bonus)
+        actual_damage = int(weapon.damage * multiplier)
+        # print(f"actual_damage:{actual_damage}")
+        # --- 类型1: melee / ranged（固定 pattern 攻击） ---
+        if weapon.weapon_type in ["melee", "meleeMove"]:
+            if weapon.weapon_type == "meleeMove":
+                actor.move(1)
+            self.attack_by_pattern(weapon,actual_damage,actor)
+
+        # --- 类型2: dash_to_enemy ---
+        elif weapon.weapon_type == "dash_to_enemy":
+            self.use_dash_to_enemy(weapon,actual_damage,actor)
+
+        # --- 类型3: shoot（攻击最近敌人） ---
+        elif weapon.weapon_type == "ranged":
+            self.shoot(weapon,actual_damage,actor)
+
+
+        # --- 类型4: fireball（攻击最近敌人±1格） ---
+        elif weapon.weapon_type == "fireball":
+            closest_pawn = self.get_closest_pawn(actor.position, direction=actor.direction,pawn_type="all")
+            if closest_pawn:
+                for pawn in self.get_blast_targets(weapon, closest_pawn.position):
+                    self.add_hit(pawn, actual_damage, weapon)
+
+        elif weapon.weapon_type == "roll":
+            new_pos=self.get_roll_target()
+            if new_pos is None:
+                self.add_message("No valid roll target!")
+                self.player.move(1)
+            else:
+                if self.all_on_board():
+                    passed = iter_bits(self.enemy_index.mask & range_mask(self.player.position + 1, new_pos))
+                else:
+                    passed = range(self.player.position + 1,new_pos)
+                for pos in passed:
+                    enemy = self.get_pawn_at(pos,"enemy")
+                    if enemy:
+                        self.add_hit(enemy, actual_damage)
+                self.player.position=new_pos
+
+        self.resolve_hits()
+
+    def add_hit(self, target, damage, weapon=None):
+        """记录一次命中：血量立即扣（同一步里后续判定要看），状态和死亡留到 resolve_hits 统一结算"""
+        target.health -= damage
+        self.pending_hits.append((target, weapon))
+
+    def resolve_hits(self):
+        """
+        结算本步所有命中：先挂状态，再统一处理死亡（掉落、玩家死亡切 game_over）
+        死掉的敌人最后一次性从列表里删掉，不在命中循环里逐个 remove
+        """
+        hits = self.pending_hits
+        if not hits:
+            return
+        self.pending_hits = []
+
+        dead = {}
+        for target, weapon in hits:
+            target.add_status(Status(*HIT_STATUS, is_illness=True))
+            if weapon is not None:
+                for status in weapon.status_effects:
+                    target.add_status(status.copy())
+            if target.health <= 0:
+                dead[target] = None
+
+        if not dead:
+            return
+        self._removing = set()
+        for target in dead:
+            target.die(self)
+        if self._removing:
+            self.enemies = [e for e in self.enemies if e not in self._removing]
+        self._removing = None
+
+
+    def all_on_board(self):
+        """所有单位都在棋盘内时，位掩码能表示全部占用，命中判定走位运算；有单位被挤出棋盘时退回逐格扫描"""
+        return not self.enemy_index.offboard and 0 <= self.player.position < self.grid_size
+
+    def get_blast_targets(self, weapon, center):
+        """爆炸范围以目标为中心，不随朝向翻转；同一格玩家优先"""
+        if not self.all_on_board():
+            pawns = (self.get_pawn_at(center + offset, pawn_type="all") for offset in weapon.pattern)
+            return [pawn for pawn in pawns if pawn]
+        blast = footprint(weapon.pattern, center, 1, self.grid_size)
+        targets = [self.enemy_index.get(pos) for pos in iter_bits(blast & self.enemy_index.mask & ~self.player_mask())]
+        if blast & self.player_mask():
+            targets.append(self.player)
+        return targets
+
+    def get_roll_target(self):
+        """翻滚落点：越过玩家面前第一段连续的敌人，落在这段敌人之后的一格"""
+        if not self.all_on_board():
+            return self.scan_roll_target()
+        occupied = self.enemy_index.mask
+        if not occupied:
+            return None
+        position = self.player.position
+
+        if self.player.direction == 1:  # 朝右
+            ahead = occupied >> (position + 1)
+            if not ahead:
+                return None
+            first = position + (ahead & -ahead).bit_length()
+            run = occupied >> first
+            last = first + (~run & (run + 1)).bit_length() - 2   # 连续的 1 有几位
+            return last + 1 if last + 1 < self.grid_size else None
+
+        elif self.player.direction == -1:  # 朝左
+            behind = occupied & range_mask(0, position)
+            if not behind:
+                return None
+            last = behind.bit_length() - 1
+            gaps = ~occupied & range_mask(0, last)   # last 以下最高的空格
+            first = gaps.bit_length()
+            return first - 1 if first > 0 else None   # 这段敌人一直排到 0 号格，左边没有落点
+
+        return None
+
+    def scan_roll_target(self):
+            positions = self.get_enemy_positions()
+            if not positions:
+                return None
+
+            if self.player.direction == 1:  # 朝右
+                # 找到第一个比玩家位置大的连续区间
+                group = []
+                for p in positions:
+                    if p > self.player.position:
+                        if not group or p == group[-1] + 1:
+                            group.append(p)
+                        else:
+                            break
+                return group[-1] + 1 if group and group[-1] + 1< self.grid_size else None
+
+            elif self.player.direction == -1:  # 朝左
+                # 找到第一个比玩家位置小的连续区间（从右往左扫）
+                group = []
+                for p in reversed(positions):
+                    if p < self.player.position:
+                        if not group or p == group[-1] - 1:
+                            group.append(p)
+                        else:
+                            break
+                return group[-1] - 1 if group and group[-1] > 0 else None
+
+            return None
+
+    def player_mask(self):
+        position = self.player.position if self.player else -1
+        return 1 << position if position >= 0 else 0
+
+    def get_attack_mask(self, weapon, actor):
+        """攻击范围掩码（pattern 按朝向翻转，只含棋盘内的格子）"""
+        return footprint(weapon.pattern, actor.position, actor.direction, self.grid_size)
+
+    def attack_by_pattern(self,weapon,actual_damage,actor):
+
+        attack_mask = self.get_attack_mask(weapon,actor)
+        for pos in iter_bits(attack_mask & self.enemy_index.mask):
+            for enemy in self.enemy_index.get_all(pos):
+                self.add_hit(enemy, actual_damage, weapon)
+        if attack_mask & self.player_mask():
+            self.add_hit(self.player, actual_damage, weapon)
+
+
+    def shoot(self, weapon,actual_damage,actor):
+        # 获取当前方向最近的敌人
+        closest_enemy = self.get_closest_pawn(actor.position, direction=actor.direction,pawn_type="all")
+        
+        if not closest_enemy:
+            self.add_message(f"{weapon.name} No enemy")
+            return False
+
+        distance = abs(closest_enemy.position - actor.position)
+
+        self.add_hit(closest_enemy, actual_damage, weapon)
+
+        # 超出最大射程
+        if distance > weapon.range:
+            self.add_message(f"{weapon.name} Too far(Max {weapon.range} tile)")
+            return False
+        
+
+    def use_dash_to_enemy(self, weapon,actual_damage,actor):
+        # 获取当前方向最近的敌人
+        closest_enemy = self.get_closest_pawn(actor.position, direction=actor.direction,pawn_type="all")
+        
+        if not closest_enemy:
+            self.add_message(f"{weapon.name} No enemy")
+            actor.position = self.get_legal_position(actor.position + actor.direction * weapon.range)
+            return False
+
+        distance = abs(closest_enemy.position - self.player.position)
+
+        # 超出冲锋最大距离
+        if distance > weapon.range:
+            self.add_message(f"{weapon.name} Too far(Max {weapon.range} tile)")
+            return False
+        
+        # 停在敌人前一格
+        if actor.direction == 1:
+            actor.position = closest_enemy.position - 1
+        else:
+            actor.position = closest_enemy.position + 1
+
+        self.attack_by_pattern(weapon,actual_damage,actor)
+
+        # 判断是否斩杀
+        if closest_enemy.health <= 0:
+            self.add_message("Kill!")
+            # 冲到敌人所在格
+            actor.position = closest_enemy.position
+
+        return True
+
+    def get_legal_position(self, postion):
+        return max(0, min(self.grid_size - 1, postion))
+
+    def get_adjusted_attack_positions(self, weapon, actor):
+        return list(iter_bits(self.get_attack_mask(weapon, actor)))
+    
+    def get_danger(self):
+        """
+        每格在下个敌人阶段的预计伤害（array，下标是格子）；只重算标脏的敌人，没有标脏时直接返回
+        内容是否变了看 self.danger.version
+        """
+        self.danger.refresh(self)
+        return self.danger.damage
+
+    def get_occupied_positions(self):
+        return set(self.enemy_index.positions)
+
+    def spawn_enemy(self):
+        # 获取所有未被占据的位置
+        taken = set(self.enemy_index.positions)
+        taken.add(self.player.position)
+        possible_positions = [i for i in range(self.grid_size) if i not in taken]
+        if not possible_positions:
+            return  # 没有空位就不刷怪
+
+        new_pos = self.rng.choice(possible_positions)
+        self.add_enemy(self.spawn_random_enemy(new_pos))
+        # self.add_message("Enemy Arrived!")
+
+    def spawn_random_enemy(self , position, monster_id=None):
+        """从图纸库中生成敌人。"""
+        if monster_id is None:
+            monster_id = self.rng.choice(list(MONSTER_LIBRARY.keys()))
+
+        logger.debug("Spawned Monster: %s", monster_id)
+        data = MONSTER_LIBRARY[monster_id]
+        
+        if self.entity_store is not None:
+            enemy = StoredEnemy(self.entity_store, monster_id, position)
+        else:
+            enemy = Enemy(monster_id,position)
+        enemy.name = data["name"]
+        enemy.health = data["health"]
+        enemy.sequence_limit = data["sequence_limit"]
+        
+        # 绑定武器（假设你已有 WEAPON_LIBRARY）
+        enemy.weapons = [WEAPON_LIBRARY[w] for w in data["weapons"]]
+        
+        # 固定意图
+        enemy.intents = data["intents"]
+        
+        return enemy
+
+    
+    def end_player_turn(self):
+        if not self.enemies and self.turn_count>=50:
+            self.game_state = "game_over"
+            self.add_message("胜利!", 300)
+            return        
+        
+        self.player.update_cooldowns()
+        if self.player.swap_cooldown > 0:
+            self.player.swap_cooldown -= 1
+        if self.game_state != "game_over":
+            self.game_state = "enemy_turn"
+        self.turn_count += 1
+
+        if self.player.status:
+            self.player.update_statuses(self.rng)#更新状态
+        
+        # 每 wave_interval 回合刷 wave_size 个敌人
+        if self.wave_interval and self.turn_count % self.wave_interval == 0:
+            for _ in range(self.wave_size):
+                self.spawn_enemy()
+        
+        # 执行敌人回合（先停顿 round_delay）
+        if self.game_state == "enemy_turn":
+            if self.round_delay:
+                self.schedule(_pause, self.round_delay)
+            self.schedule(self.execute_enemy_turn, 0)
+
+    def execute_enemy_turn(self):
+        """敌人按行动顺序各走一步：每个敌人的 AI 和它施放的武器都作为步骤交给 schedule"""
+        if self.enemy_turn_pending or self.game_state != "enemy_turn":
+            return
+        if self.speculator is not None:
+            result = self.speculator.take(self.speculation_key(), self.committed_action)
+            if result is not None:
+                self.adopt(result)
+                return
+        self.enemy_phase_mark = self.message_count
+        self.enemy_turn_pending = True
+        order = self.turn_order.start_round()
+        if self.entity_store is not None and self.schedule is _run_now:
+            self.run_stored_round(order)   # 无时间轴时整轮直接在仓库的列上跑完
+        else:
+            for enemy in order:
+                self.schedule(lambda enemy=enemy: self.take_enemy_step(enemy), 0)
+        self.schedule(self.end_enemy_turn, 0)
+
+    def take_enemy_step(self, enemy):
+        if self.entity_store is not None and enemy.ai_mode != "utility":
+            self.run_stored_round((enemy,))
+        elif enemy.alive and self.game_state != "game_over":
+            was_ready = enemy.ready_to_attack
+            if enemy.ai_mode == "utility":
+                self.ai.take_turn(enemy, self)
+            else:
+                enemy.ai_take_turn(self)
+            if was_ready or enemy.ready_to_attack:
+                self.danger.mark(enemy)   # 只有即将攻击的敌人有贡献；移动由 _enemy_moved 标脏
+
+    def run_stored_round(self, order):
+        """
+        仓库模式下按 order 让敌人依次行动；意图 AI 的状态机和 Enemy.ai_take_turn 相同（改一边要同步改另一边）
+        标记、位置、朝向直接读写仓库的列，只有移动、加武器、施放时才经过视图；效用 AI 照常走 take_enemy_step
+        """
+        store = self.entity_store
+        flags, positions, directions = store.flags, store.position, store.direction
+        player = self.player
+        index = self.enemy_index
+        mark = self.danger.mark
+        for enemy in order:
+            if enemy.ai_mode == "utility":
+                self.take_enemy_step(enemy)
+                continue
+            if enemy.store is not store or self.game_state == "game_over":
+                continue   # 本轮早些时候死了，已经离开仓库
+            i = enemy.slot
+            f = flags[i]
+            if not f & FLAG_ALIVE:
+                continue
+            if f & FLAG_WAITING:
+                position, direction, target = positions[i], directions[i], player.position
+                facing = (target - position) * direction > 0
+                if facing and enemy.type == "melee":
+                    hit = abs(target - position) <= 1
+                elif facing and enemy.type == "range":   # 同 can_hit_player：中间没有阻挡，且在第一把武器射程内
+                    reach = enemy.weapons[enemy.action_sequence[0]].range
+                    hit = not index.any_between(min(position, target), max(position, target)) \
+                        and abs(target - position) <= (reach if reach is not None else 1)
+                else:
+                    hit = False
+                if hit:
+                    self.add_message(f"Enemy is ready to attack")
+                    flags[i] = f & ~FLAG_WAITING | FLAG_READY
+                    mark(enemy)   # 危险图只算即将攻击的敌人，其余分支不影响它（移动由 _enemy_moved 标脏）
+                elif not facing:
+                    directions[i] = -direction
+                elif f & FLAG_MOVING:
+                    enemy.move(direction)
+                    flags[i] &= ~FLAG_MOVING
+                else:
+                    flags[i] = f | FLAG_MOVING
+            elif f & FLAG_READY:
+                self.execute_actions(enemy)
+                enemy.ready_to_attack = False   # 施放时可能被打死离开仓库，走视图
+                mark(enemy)
+            elif f & FLAG_ADDING:
+                enemy.execute_intent(self)
+            else:
+                flags[i] = f | FLAG_ADDING
+
+    def end_enemy_turn(self):
+        """整轮结束：每个敌人的冷却和状态只结算一次"""
+        self.enemy_turn_pending = False
+        # 执行计划只看冷却是否为 0：只有即将攻击、且有武器冷却好了（1 -> 0）的敌人要重算危险图
+        if self.entity_store is not None:
+            for enemy in self.entity_store.tick_cooldowns():
+                if enemy.ready_to_attack:
+                    self.danger.mark(enemy)
+            for enemy in self.enemies:
+                if enemy.status:   # 大多数敌人身上没有状态，直接跳过
+                    enemy.update_statuses(self.rng)
+        else:
+            for enemy in self.enemies:
+                if enemy.update_cooldowns() and enemy.ready_to_attack:
+                    self.danger.mark(enemy)
+                if enemy.status:
+                    enemy.update_statuses(self.rng)
+        if self.game_state != "game_over":
+            self.game_state = "player_turn"
+            self.begin_player_turn()
+
+
+def simple_policy(engine):
+    """简单的玩家策略：面向最近的敌人，能加武器就加，序列满了就放"""
+    player = engine.player
+    if not engine.enemies:
+        return "wait"
+    closest = engine.get_closest_pawn(player.position)
+    facing = (closest.position - player.position) * player.direction > 0
+    if not facing:
+        return "turn"
+    if player.sequence_length < player.sequence_limit:
+        for index, weapon in enumerate(player.weapons):
+            if player.is_weapon_ready(index) and not (weapon.unique_in_sequence and player.in_sequence(index)):
+                return index
+    if player.action_sequence:
+        return "execute"
+    return "wait"
+
+
+def run_battle(policy=simple_policy, seed=None, max_turns=500, grid_size=BOARDSIZE + 1, enemy_count=1,
+               ai_mode=ENEMY_AI_MODE, entity_store=False):
+    """无界面跑完一整场战斗，返回结果统计"""
+    engine = CombatEngine(seed=seed, grid_size=grid_size, enemy_count=enemy_count, ai_mode=ai_mode,
+                          entity_store=entity_store)
+    while engine.game_state != "game_over" and engine.turn_count < max_turns:
+        if engine.game_state == "player_turn":
+            acted, _ = engine.player_action(policy(engine))
+            if not acted:
+                engine.player_action("wait")
+    return {
+        "won": engine.player.alive and not engine.enemies,
+        "turns": engine.turn_count,
+        "health": engine.player.health,
+        "enemies_left": len(engine.enemies),
+    }
@@ -0,0 +1,100 @@
+# combo.py
+# 连招识别：连招表里的武器序列编译成 Aho-Corasick 自动机（trie + 失败指针）
+# 角色每往序列里加一把武器就走一步状态转移，当场知道这一步完成了哪些连招，不用回头扫整个序列
+
+from constants import LOGIC_BASE, LOGIC_COMBO_SCALE
+
+# 连招表：名字 -> 武器序列和收尾一击的额外伤害比例（受 Logic 属性加成）
+COMBO_LIBRARY = {
+    "Dereference": {
+        "sequence": ["Pointer Sword", "Template Greatsword"],
+        "bonus": 0.5,
+    },
+    "Generic Barrage": {
+        "sequence": ["Template Greatsword", "Formula Barrage"],
+        "bonus": 0.3,
+    },
+    "Stack Trace": {
+        "sequence": ["Pointer Sword", "Template Greatsword", "Formula Barrage"],
+        "bonus": 0.5,
+    },
+    "Snake Rain": {
+        "sequence": ["Snake Staff", "Text Rain"],
+        "bonus": 0.4,
+    },
+}
+
+
+class ComboAutomaton:
+    """
+    状态 0 是空序列；step(state, 武器名) 返回新状态，matches(state) 是在这一步完成的连招名
+    转移结果缓存在字典里，同一 (状态, 武器) 第二次起 O(1)
+    """
+    def __init__(self, combos):
+        self.combos = combos
+        self._goto = [{}]       # 状态 -> {武器名: 子状态}
+        self._fail = [0]
+        self._output = [()]     # 状态 -> 在此结束的连招（含失败链上的）
+        self._steps = {}        # (状态, 武器名) -> 状态
+        self._max_bonus = {}    # 武器名集合 -> max_bonus
+
+        for name, combo in combos.items():
+            state = 0
+            for weapon in combo["sequence"]:
+                nxt = self._goto[state].get(weapon)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][weapon] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                state = nxt
+            self._output[state] += (name,)
+
+        # 按层 BFS 建失败指针，输出沿失败链合并
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for weapon, child in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and weapon not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(weapon, 0)
+                self._output[child] += self._output[self._fail[child]]
+                queue.append(child)
+
+    def step(self, state, weapon_name):
+        key = (state, weapon_name)
+        nxt = self._steps.get(key)
+        if nxt is None:
+            s = state
+            while s and weapon_name not in self._goto[s]:
+                s = self._fail[s]
+            nxt = self._steps[key] = self._goto[s].get(weapon_name, 0)
+        return nxt
+
+    def matches(self, state):
+        return self._output[state]
+
+    def bonus(self, state):
+        """在这一步完成的所有连招的额外伤害比例之和（未计 Logic）"""
+        return sum(self.combos[name]["bonus"] for name in self._output[state])
+
+    def max_bonus(self, weapon_names):
+        """只用这些武器时，任意一步最多能拿到的额外伤害比例（给求解器做上界）"""
+        names = frozenset(weapon_names)
+        best = self._max_bonus.get(names)
+        if best is None:
+            usable = {name for name, combo in self.combos.items() if names.issuperset(combo["sequence"])}
+            best = self._max_bonus[names] = max(
+                (sum(self.combos[name]["bonus"] for name in output if name in usable) for output in self._output),
+                default=0)
+        return best
+
+
+def logic_scale(logic):
+    """Logic 属性对连招加成的倍率：以 LOGIC_BASE 为 1，每多一点加 LOGIC_COMBO_SCALE"""
+    return max(0.0, 1 + (logic - LOGIC_BASE) * LOGIC_COMBO_SCALE)
+
+
+# 所有角色共用的自动机
+default_combos = ComboAutomaton(COMBO_LIBRARY)
@@ -0,0 +1,44 @@
+# constants.py
+# 不依赖 pygame 的常量，战斗逻辑（含无界面模式）和渲染共用
+
+# 颜色定义（1bit风格）
+BLACK = (0, 0, 0)
+WHITE = (255, 255, 255)
+GREEN = (100, 220, 100)
+GRAY = (100, 100, 100)
+SHADOW = (50, 50, 50)
+RED = (220, 20, 60)
+
+BOARDSIZE=8
+
+SCREEN_WIDTH = 1080
+SCREEN_HEIGHT = 720
+TOOLBAR_HEIGHT = 60
+
+# 战斗场景渲染模式："full" 每帧整屏重绘，"dirty" 只重绘变化的区域
+# dirty 模式下画在场景上面的东西（工具栏）要通过 FightScene.draw_dirty 的 overlay_regions 报告自己的区域和悬停状态
+FIGHT_RENDER_MODE = "dirty"
+
+# 连招播放：每个武器结算后停留的毫秒数，以及播放倍速
+ACTION_STEP_DURATION = 500
+ACTION_PLAYBACK_SPEED = 1.0
+
+# 每隔多少回合刷一波敌人，每波几个（0 表示不刷）
+WAVE_INTERVAL = 10
+WAVE_SIZE = 2
+
+# 玩家回合结束后到敌人行动前的停顿（毫秒），0 为立即行动
+ENEMY_TURN_DELAY = 100
+
+# 玩家思考时后台预测敌人阶段（见 speculation），行动后直接采用结果，敌人阶段不再逐步播放；适合大规模战斗
+SPECULATE_ENEMY_TURN = False
+
+# 敌人 AI："intent" 按固定意图轮换，"utility" 给候选行动打分（enemy_ai.py）
+ENEMY_AI_MODE = "intent"
+
+# 每次受击附加的状态（名称, 部位）
+HIT_STATUS = ("Simplified", "brain")
+
+# 连招加成：Logic 属性为 LOGIC_BASE 时按连招表原值，每多一点再加这么多倍
+LOGIC_BASE = 10
+LOGIC_COMBO_SCALE = 0.05
@@ -0,0 +1,134 @@
+# danger_map.py
+# 危险图：每格在下一个敌人阶段预计受到的伤害，由所有“即将攻击”的敌人已排好的序列、朝向推算
+# 每个敌人的贡献单独记下来；引擎在敌人行动、移动、死亡和冷却结算时标脏，刷新时只重算标脏的敌人（先减旧贡献再加新贡献）
+
+import itertools
+from array import array
+from footprint import footprint, iter_bits
+
+TARGETED = ("ranged", "fireball", "dash_to_enemy")   # 落点取决于最近单位的武器
+
+_versions = itertools.count(1)   # 所有危险图共用，版本号不会重复
+
+
+class DangerMap:
+    """
+    damage: 每格预计伤害（array，下标是格子），界面和 AI 直接读
+    version: 内容每变化一次换一个新值（全局不重复，换了一张图也不会撞上），可以当缓存签名
+    mark(enemy): 该敌人的序列/朝向/标记变了；moved(enemy): 有单位换了位置（玩家传 None）
+    mark_all(): 所有敌人都可能变了（整局替换）；forget(enemy): 敌人离场
+    """
+    def __init__(self, grid_size):
+        self.grid_size = grid_size
+        self.damage = array("l", [0]) * grid_size
+        self.version = next(_versions)
+        self._entries = {}     # 敌人 -> (签名, [(格子, 伤害), ...])
+        self._dirty = set()
+        self._all = True       # 第一次刷新全部重算
+        self._targeted = set() # 有贡献且落点取决于最近单位的敌人，任何单位移动都要重算
+
+    def mark(self, enemy):
+        self._dirty.add(enemy)
+
+    def mark_all(self):
+        self._all = True
+
+    def moved(self, enemy=None):
+        # 没有贡献的敌人挪位置不影响危险图（变成即将攻击时引擎会另外 mark）
+        if enemy is not None and enemy in self._entries:
+            self._dirty.add(enemy)
+        if self._targeted:
+            self._dirty.update(self._targeted)
+
+    def forget(self, enemy):
+        """离场的敌人立即扣掉贡献；它原来可能是别的敌人的目标，按移动处理"""
+        self._dirty.discard(enemy)
+        self._targeted.discard(enemy)
+        entry = self._entries.pop(enemy, None)
+        if entry is not None:
+            self._apply(entry[1], -1)
+            self.version = next(_versions)
+        self.moved()
+
+    def signature(self, enemy, engine):
+        """决定该敌人贡献的全部状态；不会在下个阶段攻击的敌人为 None"""
+        if not (enemy.ready_to_attack and enemy.action_sequence):
+            return None
+        target = None
+        if any(enemy.weapons[i].weapon_type in TARGETED for i in enemy.action_sequence):
+            pawn = engine.get_closest_pawn(enemy.position, direction=enemy.direction, pawn_type="all")
+            target = pawn.position if pawn else None
+        return (enemy.position, enemy.direction, tuple(enemy.planned_actions()), enemy.damage_multiplier, target)
+
+    def contribution(self, enemy, signature):
+        """按签名推算该敌人本次攻击打到的格子和伤害"""
+        position, direction, actions, multiplier, target = signature
+        hits = []
+        for _, weapon, bonus in actions:
+            damage = int(weapon.damage * multiplier * (1 + bonus))
+            kind = weapon.weapon_type
+            if kind in ("melee", "meleeMove"):
+                if kind == "meleeMove":
+                    position += direction
+                cells = iter_bits(footprint(weapon.pattern, position, direction, self.grid_size))
+            elif target is None:
+                continue
+            elif kind == "ranged":
+                cells = (target,)
+            elif kind == "fireball":
+                cells = iter_bits(footprint(weapon.pattern, target, 1, self.grid_size))
+            elif kind == "dash_to_enemy":
+                if abs(target - position) > weapon.range:
+                    continue
+                position = target - direction
+                cells = iter_bits(footprint(weapon.pattern, position, direction, self.grid_size))
+            else:
+                continue
+            hits.extend((cell, damage) for cell in cells if 0 <= cell < self.grid_size)
+        return hits
+
+    def _apply(self, hits, sign):
+        damage = self.damage
+        for cell, amount in hits:
+            damage[cell] += sign * amount
+
+    def refresh(self, engine):
+        """只重算标脏的敌人，返回是否有变化"""
+        if self._all:
+            dirty = set(engine.enemies).union(self._entries)
+            self._all = False
+        elif self._dirty:
+            dirty = self._dirty
+        else:
+            return False
+        self._dirty = set()
+
+        entries = self._entries
+        changed = False
+        for enemy in dirty:
+            signature = self.signature(enemy, engine) if enemy.alive else None
+            entry = entries.get(enemy)
+            if entry is not None and entry[0] == signature:
+                continue
+            if entry is not None:
+                self._apply(entry[1], -1)
+            if signature is None:
+                entries.pop(enemy, None)
+                self._targeted.discard(enemy)
+                changed = changed or entry is not None
+                continue
+            hits = self.contribution(enemy, signature)
+            self._apply(hits, 1)
+            entries[enemy] = (signature, hits)
+            if any(weapon.weapon_type in TARGETED for _, weapon, _ in signature[2]):
+                self._targeted.add(enemy)
+            else:
+                self._targeted.discard(enemy)
+            changed = True
+
+        if changed:
+            self.version = next(_versions)
+        return changed
+
+    def at(self, position):
+        return self.damage[position] if 0 <= position < self.grid_size else 0
@@ -0,0 +1,262 @@
+# dungeon_map.py
+# 地牢地形网格：每格一个字节的地形编码，整张图是一块 bytearray（2000x2000 约 4MB）
+# 玩家和怪物不写进地形，由 Dungeon 单独记录；整图操作用 translate / count / 切片完成，不逐格循环
+# 下半部分是生成流程：随机洞穴或房间+走廊 -> 连通性处理 -> 从空地列表里摆放楼梯、事件、怪物
+
+import random
+import re
+from array import array
+
+# 地形编码表：编码 -> 显示字符
+WALL, FLOOR, STAIRS_DOWN, STAIRS_UP, EVENT, REWARD, WATER = range(7)
+TILE_CHARS = ("#", ".", ">", "<", "⚠", "✦", "~")
+TILE_CODES = {ch: code for code, ch in enumerate(TILE_CHARS)}
+BLOCKING = (WALL, WATER)   # 不能走的地形
+ONE_SHOT = (EVENT, REWARD)  # 踩过一次就变成地面的地形
+
+_PASSABLE = bytes(0 if code in BLOCKING else 1 for code in range(256))
+_OPEN = re.compile(b"[^" + b"".join(re.escape(bytes([code])) for code in BLOCKING) + b"]+")
+
+
+def _threshold_table(chance, below, above):
+    """translate 表：随机字节 < chance*256 的变成 below，否则 above"""
+    cut = round(chance * 256)
+    return bytes(below if b < cut else above for b in range(256))
+
+
+class DungeonGrid:
+    """
+    tiles[y * width + x] 是 (x, y) 的地形编码
+    get / set 用字符，get_code / set_code 用编码；越界一律当墙
+    dirty: set_code 改过的格子 (x, y)，渲染层取走后清空；epoch: 整图改动（重新生成等）的计数
+    """
+    def __init__(self, width, height, fill=WALL):
+        self.width = width
+        self.height = height
+        self.tiles = bytearray([fill]) * (width * height)
+        self.dirty = []
+        self.epoch = 0
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get_code(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.tiles[y * self.width + x]
+        return WALL
+
+    def set_code(self, x, y, code):
+        self.tiles[y * self.width + x] = code
+        self.dirty.append((x, y))
+
+    def get(self, x, y):
+        return TILE_CHARS[self.get_code(x, y)]
+
+    def set(self, x, y, ch):
+        self.set_code(x, y, TILE_CODES[ch])
+
+    def take_dirty(self):
+        dirty, self.dirty = self.dirty, []
+        return dirty
+
+    def mark_all(self):
+        """整图都变了：逐格记录作废，epoch 加一"""
+        self.dirty = []
+        self.epoch += 1
+
+    def is_passable(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height and _PASSABLE[self.tiles[y * self.width + x]] == 1
+
+    def row(self, y):
+        """一整行的显示字符串"""
+        start = y * self.width
+        return "".join(TILE_CHARS[c] for c in self.tiles[start:start + self.width])
+
+    def count(self, code):
+        return self.tiles.count(code)
+
+    def fill_random(self, rng=random, floor_chance=0.9):
+        """整图随机成地面/墙（一次生成随机字节再 translate），边框保持为墙"""
+        w, h = self.width, self.height
+        noise = rng.randbytes(w * h)
+        self.tiles[:] = noise.translate(_threshold_table(floor_chance, FLOOR, WALL))
+        self.fill_border(WALL)
+
+    def fill_border(self, code):
+        w, h = self.width, self.height
+        self.tiles[0:w] = bytes([code]) * w
+        self.tiles[(h - 1) * w:h * w] = bytes([code]) * w
+        self.tiles[0::w] = bytes([code]) * h
+        self.tiles[w - 1::w] = bytes([code]) * h
+        self.mark_all()
+
+    def find_all(self, code):
+        """所有该地形格子的 (x, y)"""
+        cells = []
+        index = self.tiles.find(code)
+        while index != -1:
+            cells.append((index % self.width, index // self.width))
+            index = self.tiles.find(code, index + 1)
+        return cells
+
+    def nbytes(self):
+        return len(self.tiles)
+
+
+# ===== 生成 =====
+
+def level_seed(run_seed, depth):
+    """每层的种子由整局的种子和层数决定，哪个线程、什么时候生成都一样"""
+    return random.Random(f"{run_seed}:{depth}").getrandbits(32)
+
+
+def carve_corridor(grid, a, b, rng=random):
+    """从 a 到 b 挖一条 L 形走廊（先横后竖或先竖后横随机）"""
+    (x0, y0), (x1, y1) = a, b
+    w = grid.width
+    if rng.random() < 0.5:
+        corner = (x1, y0)
+    else:
+        corner = (x0, y1)
+    for (ax, ay), (bx, by) in (((x0, y0), corner), (corner, (x1, y1))):
+        if ay == by:
+            lo, hi = min(ax, bx), max(ax, bx)
+            grid.tiles[ay * w + lo:ay * w + hi + 1] = bytes([FLOOR]) * (hi - lo + 1)
+        else:
+            lo, hi = min(ay, by), max(ay, by)
+            grid.tiles[lo * w + ax:hi * w + ax + 1:w] = bytes([FLOOR]) * (hi - lo + 1)
+
+
+def carve_rooms(grid, rng=random, count=None, min_size=3, max_size=8):
+    """
+    全图先填墙，挖 count 个矩形房间，相邻房间的中心用走廊连起来（天然连通）
+    返回第一个房间的中心 (x, y) 作为起点
+    """
+    w, h = grid.width, grid.height
+    if count is None:
+        count = max(2, w * h // 150)
+    grid.tiles[:] = bytes([WALL]) * (w * h)
+    centers = []
+    for _ in range(count):
+        rw = rng.randint(min_size, max(min_size, min(max_size, w - 2)))
+        rh = rng.randint(min_size, max(min_size, min(max_size, h - 2)))
+        rw, rh = min(rw, w - 2), min(rh, h - 2)
+        x = rng.randint(1, w - 1 - rw)
+        y = rng.randint(1, h - 1 - rh)
+        for row in range(y, y + rh):
+            grid.tiles[row * w + x:row * w + x + rw] = bytes([FLOOR]) * rw
+        center = (x + rw // 2, y + rh // 2)
+        if centers:
+            carve_corridor(grid, centers[-1], center, rng)
+        centers.append(center)
+    grid.mark_all()
+    return centers[0]
+
+
+def _components(grid):
+    """
+    可走格子的连通块：先把每行切成连续的可走段，上下两行重叠的段用并查集合并
+    返回 (段列表 [(起, 止)], 每段的根)，段的起止是 tiles 下标
+    """
+    w, h, tiles = grid.width, grid.height, grid.tiles
+    runs = []
+    row_start = [0]
+    for y in range(h):
+        runs.extend(m.span() for m in _OPEN.finditer(tiles, y * w, y * w + w))
+        row_start.append(len(runs))
+
+    parent = array("l", range(len(runs)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for y in range(1, h):
+        i, i_end = row_start[y - 1], row_start[y]
+        j, j_end = row_start[y], row_start[y + 1]
+        while i < i_end and j < j_end:
+            a0, a1 = runs[i][0] + w, runs[i][1] + w   # 上一行的段挪到本行比较
+            b0, b1 = runs[j]
+            if a0 < b1 and b0 < a1:
+                ra, rb = find(i), find(j)
+                if ra != rb:
+                    parent[ra] = rb
+            if a1 <= b1:
+                i += 1
+            else:
+                j += 1
+    return runs, [find(i) for i in range(len(runs))]
+
+
+def _nearest_in_run(a, b, w, x, y):
+    """段 [a, b) 里离 (x, y) 最近的格子，返回 (曼哈顿距离, 下标)"""
+    row = a // w
+    col = min(max(x, a % w), (b - 1) % w)
+    return abs(row - y) + abs(col - x), row * w + col
+
+
+def connect(grid, start, rng=random):
+    """
+    保证所有可走格子都能从 start 走到：
+    start 不在最大的连通块里时先挖一条走廊接过去，然后把走不到的零碎区域填成墙
+    返回可走格子数
+    """
+    w = grid.width
+    sx, sy = start
+    grid.tiles[sy * w + sx] = FLOOR
+    for attempt in range(2):
+        runs, roots = _components(grid)
+        sizes = {}
+        for (a, b), root in zip(runs, roots):
+            sizes[root] = sizes.get(root, 0) + b - a
+        index = sy * w + sx
+        main = next(root for (a, b), root in zip(runs, roots) if a <= index < b)
+        largest = max(sizes, key=sizes.get)
+        if attempt or sizes[main] == sizes[largest]:
+            break
+        # 接到最大块里离起点最近的格子
+        _, cell = min(_nearest_in_run(a, b, w, sx, sy) for (a, b), root in zip(runs, roots) if root == largest)
+        carve_corridor(grid, start, (cell % w, cell // w), rng)
+
+    wall = bytes([WALL])
+    for (a, b), root in zip(runs, roots):
+        if root != main:
+            grid.tiles[a:b] = wall * (b - a)
+    grid.mark_all()
+    return sizes[main]
+
+
+class FreeCells:
+    """
+    可以摆东西的空地下标列表；pop 随机取一个并用最后一个填洞，O(1)
+    下标存在 array('I') 里，2000x2000 的图也只占十几 MB，生成完就可以丢掉
+    """
+    def __init__(self, grid, code=FLOOR, exclude=()):
+        self.width = grid.width
+        self.cells = array("I")
+        tiles = grid.tiles
+        pattern = re.compile(re.escape(bytes([code])) + b"+")
+        for m in pattern.finditer(tiles):
+            self.cells.extend(range(*m.span()))
+        for x, y in exclude:
+            i = y * self.width + x
+            try:
+                self.cells.remove(i)
+            except ValueError:
+                pass
+
+    def __len__(self):
+        return len(self.cells)
+
+    def pop(self, rng=random):
+        """随机取出一个空地 (x, y)；没有了返回 None"""
+        cells = self.cells
+        if not cells:
+            return None
+        i = rng.randrange(len(cells))
+        cell = cells[i]
+        cells[i] = cells[-1]
+        cells.pop()
+        return cell % self.width, cell // self.width
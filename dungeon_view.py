@@ -0,0 +1,122 @@
+# dungeon_view.py
+# 地牢渲染：每种 (字符, 颜色) 只渲染一次存进字形表，地形画在一张视口大小的缓存 Surface 上
+# 只有换了地图时整张重画；镜头移动时缓存整体平移，只画新露出来的行/列；平时只补画 DungeonGrid.dirty 里改过的格子
+# 每帧的开销只和视口大小有关，和地图大小无关
+
+import pygame
+from dungeon_map import TILE_CHARS
+
+BLACK = (0, 0, 0)
+WHITE = (255, 255, 255)
+
+
+class GlyphAtlas:
+    """(字符, 颜色) -> 渲染好的 Surface，第一次用到时渲染"""
+    def __init__(self, font):
+        self.font = font
+        self._glyphs = {}
+
+    def get(self, ch, color=WHITE):
+        key = (ch, color)
+        glyph = self._glyphs.get(key)
+        if glyph is None:
+            glyph = self._glyphs[key] = self.font.render(ch, True, color)
+        return glyph
+
+
+class DungeonView:
+    """
+    origin: 视口左上角在屏幕上的位置；view_size: 视口能放下的格子数 (列, 行)
+    镜头跟着玩家走，贴到地图边缘时停住；地图比视口小时整张图画在 origin
+    """
+    def __init__(self, font, tile_size=40, origin=(100, 50), view_size=(20, 12)):
+        self.atlas = GlyphAtlas(font)
+        self.tile_size = tile_size
+        self.origin = origin
+        self.cols, self.rows = view_size
+        self.terrain = pygame.Surface((self.cols * tile_size, self.rows * tile_size))
+        self.camera = (0, 0)
+        self._grid = None
+        self._epoch = None
+
+    def follow(self, dungeon):
+        """镜头左上角的格子坐标，玩家尽量在视口中间"""
+        y, x = dungeon.player_pos
+        cam_x = min(max(x - self.cols // 2, 0), max(dungeon.width - self.cols, 0))
+        cam_y = min(max(y - self.rows // 2, 0), max(dungeon.height - self.rows, 0))
+        return cam_x, cam_y
+
+    def _draw_tile(self, grid, x, y):
+        cam_x, cam_y = self.camera
+        px, py = (x - cam_x) * self.tile_size, (y - cam_y) * self.tile_size
+        self.terrain.fill(BLACK, (px, py, self.tile_size, self.tile_size))
+        if grid.in_bounds(x, y):
+            self.terrain.blit(self.atlas.get(TILE_CHARS[grid.get_code(x, y)]), (px, py))
+
+    def refresh(self, dungeon):
+        """把地形缓存更新到当前镜头和地图"""
+        grid = dungeon.grid
+        camera = self.follow(dungeon)
+        if grid is not self._grid or grid.epoch != self._epoch:
+            self._grid, self._epoch, self.camera = grid, grid.epoch, camera
+            grid.take_dirty()
+            self._redraw(grid)
+            return
+        if camera != self.camera:
+            self._scroll(grid, camera)
+        cam_x, cam_y = camera
+        for x, y in grid.take_dirty():
+            if cam_x <= x < cam_x + self.cols and cam_y <= y < cam_y + self.rows:
+                self._draw_tile(grid, x, y)
+
+    def _redraw(self, grid):
+        self.terrain.fill(BLACK)
+        cam_x, cam_y = self.camera
+        for y in range(cam_y, min(cam_y + self.rows, grid.height)):
+            for x in range(cam_x, min(cam_x + self.cols, grid.width)):
+                self._draw_tile(grid, x, y)
+
+    def _scroll(self, grid, camera):
+        """
+        镜头移动：缓存整体平移，只画新露出来的几行/几列
+        平常走一步镜头只挪一格，只要画一行或一列（20x12 的视口是 12 或 20 格，整张重画是 240 格）
+        """
+        dx, dy = camera[0] - self.camera[0], camera[1] - self.camera[1]
+        self.camera = camera
+        if abs(dx) >= self.cols or abs(dy) >= self.rows:
+            self._redraw(grid)
+            return
+        self.terrain.scroll(-dx * self.tile_size, -dy * self.tile_size)
+        cam_x, cam_y = camera
+        cols = range(cam_x + self.cols - dx, cam_x + self.cols) if dx > 0 else range(cam_x, cam_x - dx)
+        rows = range(cam_y + self.rows - dy, cam_y + self.rows) if dy > 0 else range(cam_y, cam_y - dy)
+        for x in cols:
+            for y in range(cam_y, cam_y + self.rows):
+                self._draw_tile(grid, x, y)
+        for y in rows:
+            for x in range(cam_x, cam_x + self.cols):
+                self._draw_tile(grid, x, y)
+
+    def to_screen(self, x, y):
+        """格子坐标 -> 屏幕坐标；不在视口里返回 None"""
+        cam_x, cam_y = self.camera
+        if cam_x <= x < cam_x + self.cols and cam_y <= y < cam_y + self.rows:
+            return (self.origin[0] + (x - cam_x) * self.tile_size,
+                    self.origin[1] + (y - cam_y) * self.tile_size)
+        return None
+
+    def draw(self, screen, dungeon, player_color=WHITE, monster_color=WHITE):
+        self.refresh(dungeon)
+        screen.blit(self.terrain, self.origin)
+        # 角色层盖在地形上（先擦掉该格的地形字符）：先怪物后玩家
+        glyph = self.atlas.get('M', monster_color)
+        for m in dungeon.monsters:
+            pos = self.to_screen(m['x'], m['y'])
+            if pos:
+                self._blit_actor(screen, glyph, pos)
+        y, x = dungeon.player_pos
+        self._blit_actor(screen, self.atlas.get('@', player_color), self.to_screen(x, y))
+
+    def _blit_actor(self, screen, glyph, pos):
+        screen.fill(BLACK, (pos[0], pos[1], self.tile_size, self.tile_size))
+        screen.blit(glyph, pos)
@@ -0,0 +1,121 @@
+# enemy_ai.py
+# 可选的效用（utility）AI：敌人给候选行动打分，选分最高的执行
+# 分数只取决于一个紧凑的局面键，用有界 LRU 缓存（置换表）记住，同一轮很多敌人面对相同局面时直接查表
+
+import logging
+from cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+UTILITY_CACHE_SIZE = 4096
+MAX_KEY_DISTANCE = 10   # 距离超过这个值都按同一种局面处理
+
+ACTIONS = ("fire", "queue", "advance", "turn", "wait")
+
+
+def weapon_reach(weapon):
+    """武器朝面前能打到的最远距离"""
+    if weapon.weapon_type in ("melee", "meleeMove"):
+        return max(weapon.pattern, default=0)
+    return weapon.range or 1
+
+
+class UtilityAI:
+    def __init__(self, cache_size=UTILITY_CACHE_SIZE):
+        self.cache = LRUCache(max_items=cache_size)
+
+    def next_weapon_index(self, enemy):
+        """下一次 queue 会加入的武器编号；当前意图已排满且还没放出时为 None"""
+        if not enemy.intents:
+            return None
+        intent = enemy.intents[enemy.intent_index]
+        if enemy.intent_progress < len(intent):
+            name = intent[enemy.intent_progress]
+        elif not enemy.action_sequence:
+            name = enemy.intents[(enemy.intent_index + 1) % len(enemy.intents)][0]
+        else:
+            return None
+        return enemy.get_weapon_index(name)
+
+    def state_key(self, enemy, scene):
+        """
+        紧凑局面键：(距离, 是否面向玩家, 视线是否被挡, 已排武器能否打到, 序列长度, 序列是否已满,
+                    下一把武器能否加入, 下一把武器能否打到, 前方能否前进)
+        """
+        player = scene.player
+        position, direction = enemy.position, enemy.direction
+        offset = player.position - position
+        distance = abs(offset)
+        facing = offset * direction > 0
+        blocked = not scene.can_see(enemy, player)
+
+        sequence = enemy.action_sequence
+        reach = min((weapon_reach(enemy.weapons[i]) for i in sequence), default=0)
+
+        index = self.next_weapon_index(enemy)
+        can_queue = (index is not None
+                     and enemy.sequence_length < enemy.sequence_limit
+                     and enemy.cooldowns[index] == 0
+                     and not (enemy.weapons[index].unique_in_sequence and enemy.in_sequence(index)))
+        next_reach = weapon_reach(enemy.weapons[index]) if index is not None else 0
+
+        ahead = position + direction
+        can_advance = (0 <= ahead < scene.grid_size and ahead != player.position
+                       and scene.get_pawn_at(ahead) is None)
+
+        return (min(distance, MAX_KEY_DISTANCE), facing, blocked, bool(sequence) and distance <= reach,
+                len(sequence), enemy.sequence_length >= enemy.sequence_limit,
+                can_queue, distance <= next_reach, can_advance)
+
+    def score(self, key):
+        """给每个候选行动打分（只依赖局面键，可缓存）"""
+        (distance, facing, blocked, in_reach, seq_len, seq_full,
+         can_queue, next_in_reach, can_advance) = key
+        scores = dict.fromkeys(ACTIONS, 0)
+        scores["wait"] = 1
+
+        if not facing:
+            scores["turn"] = 80
+        elif seq_len:
+            if in_reach and not blocked:
+                scores["fire"] = 100
+            elif seq_full:
+                scores["fire"] = 5 if not can_advance else 0
+
+        if can_queue:
+            # 已经能打到就少排，离得远就多排几把再上前
+            scores["queue"] = 60 - 10 * seq_len if (in_reach or next_in_reach) else 40
+
+        if facing and can_advance and not in_reach:
+            scores["advance"] = 50 + distance if seq_len else 30 + distance
+        return scores
+
+    def choose(self, enemy, scene):
+        key = self.state_key(enemy, scene)
+        scores = self.cache.get_or_create(key, lambda: self.score(key))
+        return max(ACTIONS, key=scores.__getitem__)
+
+    def take_turn(self, enemy, scene):
+        action = self.choose(enemy, scene)
+        logger.debug("%s -> %s", enemy.name, action)
+        if action == "fire":
+            scene.execute_actions(enemy)
+        elif action == "queue":
+            if enemy.execute_intent(scene):   # 上一个意图已放完，先切换到下一个
+                enemy.execute_intent(scene)
+        elif action == "advance":
+            enemy.move(enemy.direction)
+        elif action == "turn":
+            enemy.turn_around()
+
+        # 界面用这些标记显示意图：已排好并能打到时显示即将攻击
+        enemy.waiting = enemy.adding = enemy.moving = False
+        enemy.ready_to_attack = bool(enemy.action_sequence) and enemy.can_hit_player(scene.player, scene)
+        return action
+
+    def stats(self):
+        return self.cache.stats()
+
+
+# 所有敌人共用同一个置换表
+default_ai = UtilityAI()
@@ -1,37 +1,118 @@
 import pygame
 import random
-from font_manager import get_font
+from font_manager import get_font, render_text
 from colors import *
 from Charactor import *
+from combat import CombatEngine
+from timeline import ActionTimeline
+from speculation import Speculator
+
+class HudLayer:
+    """缓存的 HUD 图层：签名不变时直接复用上次画好的 Surface"""
+    def __init__(self, pos):
+        self.pos = pos
+        self.signature = None
+        self.surface = None
+
+    def update(self, signature, build):
+        if self.surface is None or signature != self.signature:
+            self.surface = build()
+            self.signature = signature
+        return self.surface
+
+    @property
+    def rect(self):
+        return self.surface.get_rect(topleft=self.pos)
+
+    def draw(self, screen):
+        screen.blit(self.surface, self.pos)
+
+def merge_rects(rects):
+    """合并相互重叠的矩形，避免同一块区域重复重绘"""
+    merged = []
+    for rect in rects:
+        if rect.width <= 0 or rect.height <= 0:
+            continue
+        rect = rect.copy()
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
 
 class FightScene:
+    """战斗界面：渲染 CombatEngine 的状态，并把按键翻译成玩家行动"""
     def __init__(self):
-        # 游戏状态
-        self.grid_size = BOARDSIZE + 1
+        # 动作播放时间轴：武器逐个结算，按帧推进而不是阻塞等待
+        self.timeline = ActionTimeline(ACTION_STEP_DURATION, ACTION_PLAYBACK_SPEED)
+        self.speculator = Speculator() if SPECULATE_ENEMY_TURN else None  # 重开时复用同一个后台线程
+
+        # 战斗规则全部在 engine 里，界面只负责显示
+        self.engine = self.create_engine()
+
+        # 布局
+        self.grid_size = self.engine.grid_size
         self.cell_width = 100
         self.cell_height = 80
         self.grid_start_x = (SCREEN_WIDTH - self.grid_size * self.cell_width) // 2
         self.grid_start_y = 300
-        
-        # 玩家和敌人
-        self.player = Player()  # 开始在中间位置
-        self.enemies = []
-        self.spawn_enemy()
-        
-        # 游戏状态
-        self.game_state = "player_turn"  # player_turn, enemy_turn, game_over
-        self.turn_count = 0
-        self.messages = []  # 队列，最新的消息插入末尾
+        # 每个格子的 Rect 和网格背景层只生成一次
+        self.cell_rects = [pygame.Rect(self.grid_start_x + i * self.cell_width, self.grid_start_y,
+                                       self.cell_width, self.cell_height) for i in range(self.grid_size)]
+        self.board_rect = pygame.Rect(self.grid_start_x, self.grid_start_y,
+                                      self.grid_size * self.cell_width, self.cell_height)
+        self.board_layer = None
+        self.danger_layer = HudLayer(self.board_rect.topleft)   # 危险图覆盖层，按每格预计伤害缓存
         
         # 字体
         self.font = get_font("en","Cogmind",20)
         self.small_font = get_font("en","DOS",20)
         self.large_font = get_font("ch","Lolita",16)
-        
-        self.player.on_move_check = self.handle_move#回调函数绑定
-        for enemy in self.enemies:
-            enemy.on_move_check = self.handle_move
 
+        # 渲染模式：full 每帧整屏重绘；dirty 只重绘变化的区域
+        self.render_mode = FIGHT_RENDER_MODE
+        self.hud_layers = {
+            "health": HudLayer((30, SCREEN_HEIGHT-80)),
+            "turn": HudLayer((SCREEN_WIDTH- 200, 20)),
+            "weapons": HudLayer((10, 0)),
+            "sequence": HudLayer((20, 400)),
+        }
+        self.regions = {}  # 上一帧各区域的 (矩形, 签名)
+        self.needs_full_redraw = True
+
+    def create_engine(self):
+        return CombatEngine(
+            schedule=self.timeline.schedule,
+            clock=pygame.time.get_ticks,
+            round_delay=ENEMY_TURN_DELAY,
+            speculator=self.speculator,
+        )
+
+    # ===== 战斗状态（来自 engine） =====
+    @property
+    def player(self):
+        return self.engine.player
+
+    @property
+    def enemies(self):
+        return self.engine.enemies
+
+    @property
+    def game_state(self):
+        return self.engine.game_state
+
+    @game_state.setter
+    def game_state(self, value):
+        self.engine.game_state = value
+
+    @property
+    def turn_count(self):
+        return self.engine.turn_count
+
+    @property
+    def messages(self):
+        return self.engine.messages
 
     def get_player_data(self):
         return {
@@ -47,16 +128,12 @@ class FightScene:
         }
 
     def add_message(self, text, color=WHITE, duration=2000):
-        self.messages.append({
-            "text": text,
-            "color": color,
-            "time": pygame.time.get_ticks(),
-            "duration": duration,
-            "alpha": 255
-        })
+        self.engine.add_message(text, color, duration)
 
-    
     def get_cell_rect(self, position):
+        """返回格子的 Rect（共享对象，不要修改）"""
+        if 0 <= position < self.grid_size:
+            return self.cell_rects[position]
         x = self.grid_start_x + position * self.cell_width
         y = self.grid_start_y
         return pygame.Rect(x, y, self.cell_width, self.cell_height)
@@ -64,401 +141,80 @@ class FightScene:
     def get_cell_center(self, position):
         rect = self.get_cell_rect(position)
         return rect.centerx, rect.centery
-    
-    def get_pawn_at(self, pos, pawn_type="enemy"):
-        if pawn_type == "enemy":
-            pawns = self.enemies
-        elif pawn_type == "player":
-            pawns = [self.player]
-        elif pawn_type == "all":
-            pawns = []
-            if self.player:   # 玩家存在才加
-                pawns.append(self.player)
-            pawns.extend(self.enemies)
-        else:
-            pawns = []
-        # 🔑 过滤掉 None
-        pawns = [p for p in pawns if p is not None]
-
-        return next((pawn for pawn in pawns if pawn.position == pos), None)
-    
-    def get_enemy_positions(self):
-        """返回已排序的敌人位置"""
-        return sorted(enemy.position for enemy in self.enemies if enemy.alive)
-    
-    def get_closest_pawn(self, source_position , max_range=None, direction=None, pawn_type="enemy"):
-        """
-        从整个 scene 中找最近的单位
-        :return: 最近的 pawn 或 None
-        """
-        # 根据 pawn_type 确定候选列表
-        if pawn_type == "enemy":
-            candidates = self.enemies
-        elif pawn_type == "player":
-            candidates = [self.player]
-        elif pawn_type == "all":
-            candidates = [self.player] + self.enemies
-        else:
-            candidates = []
-
-        if not candidates:
-            return None
-
-        # 按方向过滤
-        if direction == 1:  # 右边
-            candidates = [p for p in candidates if p.position > source_position]
-        elif direction == -1:  # 左边
-            candidates = [p for p in candidates if p.position < source_position]
-
-        if not candidates:
-            return None
-
-        # 找最近
-        closest = min(candidates, key=lambda p: abs(p.position - source_position))
-
-        # 射程判定
-        if max_range is not None and abs(closest.position - source_position) > max_range:
-            return None
 
-        return closest
-    
-    def can_see(self,pawn1,pawn2):
-        # 视线判定：两者之间没有其他单位阻挡
-        if pawn1.position == pawn2.position:
-            return True
-        start = min(pawn1.position, pawn2.position)
-        end = max(pawn1.position, pawn2.position)
-        for enemy in self.enemies:
-            if enemy.position > start and enemy.position < end:
-                return False
-        return True
-
-
- 
-    def handle_move(self, actor, new_pos):
-        enemy = self.get_pawn_at(new_pos,"enemy")
-
-        if enemy:#面前为敌人
-            # 只有玩家可以换位，且要检查冷却
-            if isinstance(actor, Player) and actor.swap_cooldown == 0:
-                # 执行换位
-                enemy.position, actor.position = actor.position, enemy.position
-                actor.swap_cooldown = 4  # 重置换位冷却
-                return actor.position  # 玩家位置更新后返回新位置
-            else:
-                # 敌人不能换位，玩家换位冷却中也不能换位
-                return None
-        else:
-            if actor.can_move_to(new_pos) and self.player.position!=new_pos:#防止怪物跑到玩家脸上
-                return new_pos
-            else:
-                return None
+    def update(self, dt):
+        """每帧推进动作播放，dt 为毫秒"""
+        if self.game_state == "game_over":
+            self.timeline.clear()
+            return
+        self.timeline.update(dt)
 
-    
     def handle_event(self,event):
+        # 动作播放中：回车跳过，其余输入忽略
+        if self.timeline.is_busy():
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN:
+                self.timeline.skip()
+            return
+
         if self.game_state != "player_turn":
             return
         
         if event.type == pygame.KEYDOWN:
+            action = None
             # === 移动：A / ←（左），D / →（右） ===
             if event.key in [pygame.K_a, pygame.K_LEFT]:
-                if self.player.move(-1):
-                    self.end_player_turn()
+                action = "left"
             elif event.key in [pygame.K_d, pygame.K_RIGHT]:
-                if self.player.move(1):
-                    self.end_player_turn()
+                action = "right"
             elif event.key in [pygame.K_w, pygame.K_UP]:
-                self.player.turn_around()
-                self.end_player_turn()
+                action = "turn"
             elif event.key in [pygame.K_s, pygame.K_DOWN]:
-                self.end_player_turn()
+                action = "wait"
             elif event.key in [pygame.K_1, pygame.K_2, pygame.K_3, pygame.K_4, pygame.K_5, pygame.K_6, pygame.K_7, pygame.K_8, pygame.K_9]:
-                index = event.key - pygame.K_1
-                success, msg = self.player.try_add_weapon_to_sequence(index,self)
-                if success:
-                    self.end_player_turn()
-                self.add_message(msg) 
+                action = event.key - pygame.K_1
             elif event.key == pygame.K_SPACE:
-                if self.player.action_sequence:
-                    self.execute_actions(self.player)
-                    self.end_player_turn()
-                else:
-                    self.add_message("Empty Sequence!")
-    def print_executed_actions(self,executed_actions):
-        """
-        打印 executed_actions 列表内容，不换行，用 -> 分隔
-        executed_actions: [(index, weapon), ...]
-        """
-        if not executed_actions:
-            print("No actions executed.")
-            return
-
-        for i, (index, weapon) in enumerate(executed_actions):
-            end_char = "->" if i < len(executed_actions) - 1 else "\n"
-            print(f"{weapon.name}({index})", end=end_char)
-
-
-    def execute_actions(self,actor):
-        executed_actions = actor.execute_sequence()
-
-        if self.player.battle_style == "stack":# stack风格反转序列
-            executed_actions.reverse()
-        self.print_executed_actions(executed_actions)
-
-        for weapon_index, weapon in executed_actions:
-            multiplier = actor.damage_multiplier
-            actual_damage = int(weapon.damage * multiplier)
-            # print(f"actual_damage:{actual_damage}")
-            # --- 类型1: melee / ranged（固定 pattern 攻击） ---
-            if weapon.weapon_type in ["melee", "meleeMove"]:
-                if weapon.weapon_type == "meleeMove":
-                    actor.move(1)
-                self.attack_by_pattern(weapon,actual_damage,actor)
-
-            # --- 类型2: dash_to_enemy ---
-            elif weapon.weapon_type == "dash_to_enemy":
-                self.use_dash_to_enemy(weapon,actual_damage,actor)
-
-            # --- 类型3: shoot（攻击最近敌人） ---
-            elif weapon.weapon_type == "ranged":
-                self.shoot(weapon,actual_damage,actor)
-
-
-            # --- 类型4: fireball（攻击最近敌人±1格） ---
-            elif weapon.weapon_type == "fireball":
-                closest_pawn = self.get_closest_pawn(actor.position, direction=actor.direction,pawn_type="all")
-                if closest_pawn:
-                    print(f"explosion_center:{closest_pawn.position}")
-                    for offset in weapon.pattern:
-                        position = closest_pawn.position + offset
-                        pawn = self.get_pawn_at(position,pawn_type="all")
-                        if pawn:
-                            pawn.take_damage(actual_damage,scene=self)
-                            actor.apply_weapon_effects(pawn, weapon)
-
-            elif weapon.weapon_type == "roll":
-                new_pos=self.get_roll_target()
-                if new_pos is None:
-                    self.add_message("No valid roll target!")
-                    self.player.move(1)
-                else:
-                    for pos in range(self.player.position + 1,new_pos):
-                        if self.get_pawn_at(pos,"enemy"):
-                            self.get_pawn_at(pos,"enemy").take_damage(actual_damage,scene=self)
-                    self.player.position=new_pos
-
-            pygame.display.flip()
-            pygame.time.wait(500) # 暂停0.5秒
-            
-            # print(666)
-
-
-    def get_roll_target(self):
-            positions = self.get_enemy_positions()
-            if not positions:
-                return None
-
-            if self.player.direction == 1:  # 朝右
-                # 找到第一个比玩家位置大的连续区间
-                group = []
-                for p in positions:
-                    if p > self.player.position:
-                        if not group or p == group[-1] + 1:
-                            group.append(p)
-                        else:
-                            break
-                return group[-1] + 1 if group and group[-1] + 1<= BOARDSIZE else None
-
-            elif self.player.direction == -1:  # 朝左
-                # 找到第一个比玩家位置小的连续区间（从右往左扫）
-                group = []
-                for p in reversed(positions):
-                    if p < self.player.position:
-                        if not group or p == group[-1] - 1:
-                            group.append(p)
-                        else:
-                            break
-                return group[-1] - 1 if group and group[-1] + 1<= BOARDSIZE else None
-
-            return None
-
-
-
-
-    def attack_by_pattern(self,weapon,actual_damage,actor):
-
-        attack_positions = self.get_adjusted_attack_positions(weapon,actor)
-        for enemy in self.enemies[:]:
-            if enemy.position in attack_positions:
-                enemy.take_damage(actual_damage,scene=self)
-                actor.apply_weapon_effects(enemy, weapon)
-        if self.player.position in attack_positions:
-            self.player.take_damage(actual_damage,scene=self)
-            actor.apply_weapon_effects(self.player, weapon)
-
-
-    def shoot(self, weapon,actual_damage,actor):
-        # 获取当前方向最近的敌人
-        closest_enemy = self.get_closest_pawn(actor.position, direction=actor.direction,pawn_type="all")
-        
-        if not closest_enemy:
-            self.add_message(f"{weapon.name} No enemy")
-            return False
+                action = "execute"
 
-        distance = abs(closest_enemy.position - actor.position)
+            if action is not None:
+                acted, msg = self.engine.player_action(action)
+                if msg:
+                    self.add_message(msg)
 
-        closest_enemy.take_damage(actual_damage,scene=self)
-        actor.apply_weapon_effects(closest_enemy, weapon)
+    def build_board_layer(self):
+        """预先画好网格背景（格子 + 编号），之后每帧只需一次 blit"""
+        layer = pygame.Surface(self.board_rect.size)
+        layer.fill(BLACK)
+        for i, cell in enumerate(self.cell_rects):
+            rect = cell.move(-self.board_rect.x, -self.board_rect.y)
+            pygame.draw.rect(layer, GRAY, rect, 2)
 
-        # 超出最大射程
-        if distance > weapon.range:
-            self.add_message(f"{weapon.name} Too far(Max {weapon.range} tile)")
-            return False
-        
-
-    def use_dash_to_enemy(self, weapon,actual_damage,actor):
-        # 获取当前方向最近的敌人
-        closest_enemy = self.get_closest_pawn(actor.position, direction=actor.direction,pawn_type="all")
-        
-        if not closest_enemy:
-            self.add_message(f"{weapon.name} No enemy")
-            actor.position = self.get_legal_position(actor.position + actor.direction * weapon.range)
-            return False
-
-        distance = abs(closest_enemy.position - self.player.position)
-
-        # 超出冲锋最大距离
-        if distance > weapon.range:
-            self.add_message(f"{weapon.name} Too far(Max {weapon.range} tile)")
-            return False
-        
-        # 停在敌人前一格
-        if actor.direction == 1:
-            actor.position = closest_enemy.position - 1
-        else:
-            actor.position = closest_enemy.position + 1
-
-        self.attack_by_pattern(weapon,actual_damage,actor)
-
-        # 判断是否斩杀
-        if closest_enemy.health <= 0:
-            self.add_message("Kill!")
-            # 冲到敌人所在格
-            actor.position = closest_enemy.position
-
-        return True
-
-    def get_legal_position(self, postion):
-        return max(0, min(self.grid_size - 1, postion))
-
-    def get_adjusted_attack_positions(self, weapon, actor):
-        adjusted_positions = []
-        for offset in weapon.pattern:
-            actual_offset = offset * actor.direction  # 左右翻转
-            target_pos = actor.position + actual_offset
-            if 0 <= target_pos < self.grid_size:
-                adjusted_positions.append(target_pos)
-        print(f"方向: {actor.direction}, 攻击格子: {adjusted_positions}")
-        return adjusted_positions
-    
-    def get_occupied_positions(self):
-        return {enemy.position for enemy in self.enemies}
-
-    def spawn_enemy(self):
-        # 获取所有未被占据的位置
-        occupied_positions = {enemy.position for enemy in self.enemies}
-        occupied_positions.add(self.player.position)
-
-        possible_positions = [i for i in range(self.grid_size) if i not in occupied_positions]
-        if not possible_positions:
-            return  # 没有空位就不刷怪
-
-        new_pos = random.choice(possible_positions)
-        new_enemy = self.spawn_random_enemy(new_pos)
-        new_enemy.on_move_check = self.handle_move
-        self.enemies.append(new_enemy)
-        # self.add_message("Enemy Arrived!")
-
-    def spawn_random_enemy(self , position, monster_id=None):
-        """从图纸库中生成敌人。"""
-        if monster_id is None:
-            monster_id = random.choice(list(MONSTER_LIBRARY.keys()))
-
-        print(f"Spawned Monster: {monster_id}")
-        data = MONSTER_LIBRARY[monster_id]
-        
-        enemy = Enemy(monster_id,position)
-        enemy.name = data["name"]
-        enemy.health = data["health"]
-        enemy.sequence_limit = data["sequence_limit"]
-        
-        # 绑定武器（假设你已有 WEAPON_LIBRARY）
-        enemy.weapons = [WEAPON_LIBRARY[w] for w in data["weapons"]]
-        
-        # 固定意图
-        enemy.intents = data["intents"]
-        
-        return enemy
+            # 绘制位置编号
+            pos_text = render_text(self.small_font, str(i), True, GRAY)
+            layer.blit(pos_text, (rect.x + 5, rect.y + 5))
+        return layer
 
-    
-    def end_player_turn(self):
-        if not self.enemies and self.turn_count>=50:
-            self.game_state = "game_over"
-            self.add_message("胜利!", 300)
-            return        
-        
-        self.player.update_cooldowns()
-        if self.player.swap_cooldown > 0:
-            self.player.swap_cooldown -= 1
-        if self.game_state != "game_over":
-            self.game_state = "enemy_turn"
-        self.turn_count += 1
-
-        self.player.update_statuses()#更新状态
-        
-        # 每10回合刷2个敌人
-        if self.turn_count % 10 == 0:
-            self.spawn_enemy()
-            self.spawn_enemy()
-        
-        # 执行敌人回合
-        pygame.time.set_timer(pygame.USEREVENT + 1, 100)  # 1秒后执行敌人回合
-
-    def end_enemy_turn(self):
-        for enemy in self.enemies :      
-            enemy.update_cooldowns()
-        if self.game_state != "game_over":
-            self.game_state = "player_turn"
-                
-        # 执行敌人回合
-        pygame.time.set_timer(pygame.USEREVENT + 1, 100)  # 0.1秒后执行玩家回合
-    
-    def execute_enemy_turn(self,scene):
-        for enemy in self.enemies:
-            enemy.ai_take_turn(scene)
-            self.end_enemy_turn()
-        
-        # 设置新的攻击意图
-        if self.game_state != "game_over":
-            self.game_state = "player_turn"
-    
     def draw_grid(self,screen):
-        for i in range(self.grid_size):
-            rect = self.get_cell_rect(i)
-            
-            # 绘制网格背景
-            color = BLACK
-            # if i == self.player.position:
-            #     color = GRAY  # 玩家位置
-            
-            pygame.draw.rect(screen, color, rect)
-            pygame.draw.rect(screen, GRAY, rect, 2)
-            
-            # 绘制位置编号
-            pos_text = self.small_font.render(str(i), True, GRAY)
-            text_rect = pos_text.get_rect(topleft=(rect.x + 5, rect.y + 5))
-            screen.blit(pos_text, text_rect)
+        if self.board_layer is None:
+            self.board_layer = self.build_board_layer()
+        screen.blit(self.board_layer, self.board_rect.topleft)
     
+    def build_danger_layer(self, danger):
+        """危险图：敌人下个阶段会打到的格子染红，越痛越深，并标出预计伤害"""
+        layer = pygame.Surface(self.board_rect.size, pygame.SRCALPHA)
+        for i, damage in enumerate(danger):
+            if damage <= 0:
+                continue
+            rect = self.cell_rects[i].move(-self.board_rect.x, -self.board_rect.y).inflate(-4, -4)
+            layer.fill((*RED, min(40 + damage * 6, 160)), rect)
+            text = render_text(self.small_font, f"-{damage}", True, WHITE)
+            layer.blit(text, text.get_rect(bottomright=(rect.right - 4, rect.bottom - 2)))
+        return layer
+
+    def draw_danger(self, screen):
+        danger = self.engine.get_danger()
+        self.danger_layer.update(self.engine.danger.version, lambda: self.build_danger_layer(danger))
+        self.danger_layer.draw(screen)
+
     def draw_entities(self,screen):
         self.draw_character_with_arrow(screen, self.player,"Hero")
         
@@ -477,32 +233,28 @@ class FightScene:
 
             self.draw_character_with_arrow(screen, enemy ,"Enemy")
 
+    def get_character_image(self, pawn, type):
+        # 加载图片（朝左的翻转版本也由缓存提供）
+        flip = pawn.direction != 1
+        if type =="Hero":
+            return load_image('arts/sprite/Character/hero.png', flip=flip)
+        # 与敌人名字对应的图片，找不到时 load_image 换成默认的 enemy.png
+        return load_image(f"arts/sprite/Character/{pawn.name}.png",(48,48), flip=flip)
+
     def draw_character_with_arrow(self, screen , pawn, type):
         arrow_font = get_font("ch","Lolita")
-        
-        # 加载图片
-        if type =="Hero":
-            character = load_image('arts/sprite/Character/hero.png')
-        elif type == "Enemy":
-            try:
-                # 尝试加载与敌人名字对应的图片
-                character = load_image(f"arts/sprite/Character/{pawn.name}.png",(48,48))
-            except FileNotFoundError:
-                # 如果文件不存在，加载默认图
-                character = load_image("arts/sprite/Character/enemy.png")
+        draw_img = self.get_character_image(pawn, type)
 
         if hasattr(pawn,"moving") and pawn.moving:
             arrow_color = GREEN
         else:
             arrow_color = GRAY
-            
-        # 根据方向翻转
+
+        # 根据方向选择箭头
         if pawn.direction == 1:  # 朝右
-            draw_img = character
-            arrow_surface = arrow_font.render("→", True, arrow_color)
+            arrow_surface = render_text(arrow_font, "→", True, arrow_color)
         else:  # 朝左
-            draw_img = pygame.transform.flip(character, True, False)
-            arrow_surface = arrow_font.render("←", True, arrow_color)
+            arrow_surface = render_text(arrow_font, "←", True, arrow_color)
 
         # 获取格子矩形 & 中心
         rect = self.get_cell_rect(pawn.position)
@@ -520,11 +272,30 @@ class FightScene:
 
         if type =="Hero":
             line= "#" * pawn.swap_cooldown
-            cooldown_surface = arrow_font.render(line, True, GRAY)
+            cooldown_surface = render_text(arrow_font, line, True, GRAY)
             screen.blit(cooldown_surface, (arrow_x, arrow_y + 10))
         if type =="Enemy":
             self.draw_intents(screen,pawn,pos=(center_x, center_y))
 
+    def get_intent_rects(self, pawn):
+        """敌人头顶每个意图图标的 (武器, 矩形)"""
+        center_x, center_y = self.get_cell_center(pawn.position)
+        intent_y = center_y - 90
+        rects = []
+        for index in pawn.action_sequence:
+            rects.append((pawn.weapons[index], pygame.Rect(center_x - 24, intent_y, 48, 48)))
+            intent_y -= 48  # 间距调整
+        return rects
+
+    def get_hovered_intent(self, mouse_pos):
+        """鼠标当前悬停的意图武器，没有则返回 None"""
+        hovered_weapon = None
+        for enemy in self.enemies:
+            for weapon, rect in self.get_intent_rects(enemy):
+                if rect.collidepoint(mouse_pos):
+                    hovered_weapon = weapon
+        return hovered_weapon
+
     def draw_intents(self, screen, pawn, pos):
         intent_x = pos[0] 
         intent_y = pos[1] - 90
@@ -533,15 +304,13 @@ class FightScene:
         hovered_weapon = None  # 当前悬停的武器
         weapon_color = GREEN if pawn.ready_to_attack else RED
 
-        for index in pawn.action_sequence:
-            weapon = pawn.weapons[index]
+        for weapon, rect in self.get_intent_rects(pawn):
             weapon_image = load_image(f"arts/sprite/weapons/{weapon.name}.png",(48,48))
 
             # 绘制图标
-            rect = weapon_image.get_rect(topleft=(intent_x - 24, intent_y))
             render_1bit_sprite(screen, weapon_image, rect.topleft, weapon_color)
             font = get_font("en", "DOS", 16)
-            screen.blit(font.render(f"{weapon.damage}", True, WHITE), (intent_x - 24, intent_y + 30))
+            screen.blit(render_text(font, f"{weapon.damage}", True, WHITE), (intent_x - 24, rect.y + 30))
 
             # 如果鼠标悬停在这个图标上
             if rect.collidepoint(mouse_pos):
@@ -551,7 +320,7 @@ class FightScene:
 
         # 加号（正在添加新动作）
         if pawn.adding:
-            plus_surface = self.font.render("+", True, RED)
+            plus_surface = render_text(self.font, "+", True, RED)
             screen.blit(plus_surface, (intent_x, intent_y))
             intent_y -= 48
 
@@ -563,7 +332,7 @@ class FightScene:
             line += "!!!"
 
         if line:
-            text_surface = self.small_font.render(line, True, weapon_color)
+            text_surface = render_text(self.small_font, line, True, weapon_color)
             screen.blit(text_surface, (intent_x-10, intent_y + 20))
 
         # ==============================
@@ -572,22 +341,31 @@ class FightScene:
         if hovered_weapon:
             self.draw_weapon_tooltip(screen, hovered_weapon, mouse_pos)
 
-    def draw_weapon_tooltip(self, screen, weapon, pos):
-        
-        """在鼠标位置显示武器信息"""
-        lines = [
+    def get_tooltip_lines(self, weapon):
+        return [
             f"{weapon.name}",
             f"Damage: {weapon.damage}",
             f"Range: {getattr(weapon, 'range', 'N/A')}",
             f"Type: {weapon.weapon_type}"
         ]
 
+    def get_tooltip_rect(self, weapon, pos):
+        lines = self.get_tooltip_lines(weapon)
         padding = 5
-        width = 200
+        # 宽度至少 200，标题过长时撑开，避免文字溢出边框
+        title_width = get_font("en", "Patriot", 24).size(lines[0])[0]
+        width = max(200, title_width + padding * 2)
         height = len(lines) * 18 + padding * 2
 
         x, y = pos
-        rect = pygame.Rect(x + 15, y + 15, width, height)
+        return pygame.Rect(x + 15, y + 15, width, height)
+
+    def draw_weapon_tooltip(self, screen, weapon, pos):
+        
+        """在鼠标位置显示武器信息"""
+        lines = self.get_tooltip_lines(weapon)
+        padding = 5
+        rect = self.get_tooltip_rect(weapon, pos)
 
         # 黑底
         pygame.draw.rect(screen, (0, 0, 0), rect)
@@ -602,45 +380,72 @@ class FightScene:
                 font = get_font("en", "Patriot", 24)
             else:
                 font = self.small_font
-            text_surface = font.render(line, True, WHITE)
+            text_surface = render_text(font, line, True, WHITE)
             screen.blit(text_surface, (rect.x + padding, rect.y + padding + i * 18))
 
-    def draw_ui(self,screen):
-        # 绘制玩家血量,假设最大血量是 10 格
+    def update_hud_layers(self):
+        """HUD 各部分签名变化时才重新绘制对应图层"""
+        player = self.player
+
+        # 玩家血量,假设最大血量是 10 格
+        self.hud_layers["health"].update((player.health, player.max_health), self.build_health_layer)
+        # 回合数
+        self.hud_layers["turn"].update(self.turn_count,
+            lambda: render_text(self.font, f"Turn: {self.turn_count}", True, WHITE))
+        # 武器状态
+        weapon_signature = (tuple(player.weapons), tuple(player.cooldowns))
+        self.hud_layers["weapons"].update(weapon_signature, self.build_weapons_layer)
+        # 动作序列
+        self.hud_layers["sequence"].update(tuple(player.action_sequence), self.build_sequence_layer)
+
+    def build_health_layer(self):
         max_bar_length = 10  
         filled = int(self.player.health / self.player.max_health * max_bar_length)
         bar_str = "#" * filled + "." * (max_bar_length - filled)
-        health_text = self.small_font.render(f"HP: {bar_str}({self.player.health}/{self.player.max_health})", True, WHITE)
-        screen.blit(health_text, (30, SCREEN_HEIGHT-80))
-        
-        # 绘制回合数
-        turn_text = self.font.render(f"Turn: {self.turn_count}", True, WHITE)
-        screen.blit(turn_text, (SCREEN_WIDTH- 200, 20))
-        
-        # 绘制武器状态
-        weapon_y = 10
+        return render_text(self.small_font, f"HP: {bar_str}({self.player.health}/{self.player.max_health})", True, WHITE)
+
+    def build_weapons_layer(self):
+        # 图层左上角在 (10, 0)：文字在 x=10，图标在 x=30
+        rows = []
         for i, weapon in enumerate(self.player.weapons):
-            color = GREEN if weapon.is_ready() else RED
-            cooldown_text = f"{weapon.damage},{weapon.current_cooldown}" if not weapon.is_ready() else f"{weapon.damage},Ready"
-            
-            weapon_text = self.small_font.render(f"{i+1}.    {weapon.name} ({cooldown_text})", True, color)
-            screen.blit(weapon_text, (10, weapon_y + i * 30))
+            cooldown = self.player.cooldowns[i]
+            color = GREEN if cooldown == 0 else RED
+            cooldown_text = f"{weapon.damage},{cooldown}" if cooldown else f"{weapon.damage},Ready"
+            weapon_text = render_text(self.small_font, f"{i+1}.    {weapon.name} ({cooldown_text})", True, color)
             weapon_image = load_image(f"arts/sprite/weapons/{weapon.name}.png", (32, 32))
-            render_1bit_sprite(screen, weapon_image, (30, weapon_y + i * 30 - 10 ), color)
-        
-        # 绘制动作序列
-        if self.player.action_sequence:
-            seq_text = self.font.render("Sequence:", True, WHITE)
-            screen.blit(seq_text, (20, 400))
-            
-            for i, index in enumerate(self.player.action_sequence):
-                weapon_name = self.player.weapons[index].name
-                action_text = self.small_font.render(f"- {weapon_name}", True, GREEN)
-                screen.blit(action_text, (30, 430 + i * 25))
-        
-    def draw_messages(self, screen, font, pos=(SCREEN_WIDTH-500, 400)):
+            rows.append((weapon_text, get_tinted(weapon_image, color)))
+
+        width = max([max(text.get_width(), 20 + icon.get_width()) for text, icon in rows] or [1])
+        height = max([max(10 + i * 30 + text.get_height(), i * 30 + icon.get_height())
+                      for i, (text, icon) in enumerate(rows)] or [1])
+        layer = pygame.Surface((width, height), pygame.SRCALPHA)
+        for i, (text, icon) in enumerate(rows):
+            layer.blit(text, (0, 10 + i * 30))
+            layer.blit(icon, (20, i * 30))
+        return layer
+
+    def build_sequence_layer(self):
+        if not self.player.action_sequence:
+            return pygame.Surface((0, 0), pygame.SRCALPHA)
+        seq_text = render_text(self.font, "Sequence:", True, WHITE)
+        action_texts = [render_text(self.small_font, f"- {self.player.weapons[index].name}", True, GREEN)
+                        for index in self.player.action_sequence]
+        width = max([seq_text.get_width()] + [10 + t.get_width() for t in action_texts])
+        height = max([seq_text.get_height()] + [30 + i * 25 + t.get_height() for i, t in enumerate(action_texts)])
+        layer = pygame.Surface((width, height), pygame.SRCALPHA)
+        layer.blit(seq_text, (0, 0))
+        for i, action_text in enumerate(action_texts):
+            layer.blit(action_text, (10, 30 + i * 25))
+        return layer
+
+    def draw_ui(self,screen):
+        self.update_hud_layers()
+        for layer in self.hud_layers.values():
+            layer.draw(screen)
+
+    def update_messages(self):
+        """计算消息淡出进度，并清理完全透明的消息"""
         now = pygame.time.get_ticks()
-        y_offset = 0
         to_remove = []
 
         for msg in self.messages:
@@ -654,8 +459,14 @@ class FightScene:
             # 完全透明就删除
             if msg["alpha"] <= 0:
                 to_remove.append(msg)
-                continue
 
+        # 清理过期消息
+        for msg in to_remove:
+            self.messages.remove(msg)
+
+    def draw_messages(self, screen, font, pos=(SCREEN_WIDTH-500, 400)):
+        y_offset = 0
+        for msg in self.messages:
             # 渲染文字
             text_surface = font.render(msg["text"], True, msg["color"])
             text_surface.set_alpha(int(msg["alpha"]))
@@ -663,13 +474,22 @@ class FightScene:
 
             y_offset += font.get_height() + 5  # 每条消息向下偏移
 
-        # 清理过期消息
-        for msg in to_remove:
-            self.messages.remove(msg)    
+    def get_messages_rect(self, font, pos=(SCREEN_WIDTH-500, 400)):
+        if not self.messages:
+            return None
+        width = max(font.size(msg["text"])[0] for msg in self.messages)
+        height = len(self.messages) * (font.get_height() + 5)
+        return pygame.Rect(pos[0], pos[1], width, height)
     
     def draw(self, screen):
+        self.update_messages()
+        self.draw_scene(screen)
+
+    def draw_scene(self, screen):
+        """按当前状态画一整帧（不推进消息淡出）"""
         # 绘制网格
         self.draw_grid(screen)
+        self.draw_danger(screen)
         
         # 绘制实体
         self.draw_entities(screen)
@@ -684,6 +504,109 @@ class FightScene:
         if self.game_state == "game_over":
             self.game_over(screen)
 
+    # ===== 脏矩形渲染 =====
+    def invalidate(self):
+        """下一帧整屏重绘（切回战斗界面、关闭弹窗后调用）"""
+        self.needs_full_redraw = True
+
+    def get_column_rect(self, position, pawns):
+        """格子所在的整列：包括角色、血条、头顶意图"""
+        cell = self.get_cell_rect(position)
+        rect = pygame.Rect(cell.x, 0, cell.width, cell.bottom)
+        for pawn in pawns:
+            image = self.get_character_image(pawn, "Hero" if pawn is self.player else "Enemy")
+            rect.union_ip(image.get_rect(center=cell.center))
+        return rect
+
+    def get_pawn_signature(self, pawn):
+        return (pawn is self.player, pawn.position, pawn.direction, pawn.health, pawn.max_health,
+                getattr(pawn, "name", None), tuple(pawn.action_sequence),
+                getattr(pawn, "moving", False), getattr(pawn, "adding", False),
+                getattr(pawn, "waiting", False), getattr(pawn, "ready_to_attack", False),
+                getattr(pawn, "swap_cooldown", 0))
+
+    def collect_regions(self, screen, overlay_regions=None):
+        """
+        当前帧所有可变区域的 {键: (矩形, 签名)}，签名变化的区域才需要重绘
+        overlay_regions: 画在场景之上的内容（工具栏等）自己的 {键: (矩形, 签名)}，签名里要带上悬停/打开状态
+        """
+        regions = {("overlay", key): region for key, region in (overlay_regions or {}).items()}
+        if self.game_state == "game_over":
+            regions["game_over"] = (screen.get_rect(), bool(self.enemies))
+            return regions
+
+        # 棋盘：按格子分列，角色移动时旧列和新列都会变化
+        columns = {}
+        for pawn in [self.player] + self.enemies:
+            columns.setdefault(pawn.position, []).append(pawn)
+        for position, pawns in columns.items():
+            signature = tuple(self.get_pawn_signature(p) for p in pawns)
+            regions[("column", position)] = (self.get_column_rect(position, pawns), signature)
+
+        # 悬停提示
+        mouse_pos = pygame.mouse.get_pos()
+        hovered_weapon = self.get_hovered_intent(mouse_pos)
+        if hovered_weapon:
+            regions["tooltip"] = (self.get_tooltip_rect(hovered_weapon, mouse_pos),
+                                  tuple(self.get_tooltip_lines(hovered_weapon)))
+
+        # 危险图（签名是危险图版本号，内容变了才会换）
+        self.engine.get_danger()
+        regions["danger"] = (self.board_rect, self.engine.danger.version)
+
+        # HUD
+        self.update_hud_layers()
+        for name, layer in self.hud_layers.items():
+            regions[("hud", name)] = (layer.rect, layer.signature)
+
+        # 消息
+        messages_rect = self.get_messages_rect(self.small_font)
+        if messages_rect:
+            signature = tuple((msg["text"], msg["color"], int(msg["alpha"])) for msg in self.messages)
+            regions["messages"] = (messages_rect, signature)
+        return regions
+
+    def draw_dirty(self, screen, overlay=None, overlay_regions=None):
+        """
+        脏矩形模式：只重绘变化的区域
+        overlay: 画在战斗场景之上的其他内容（工具栏），和场景一起在脏区域内重画
+        overlay_regions: 返回 overlay 可变区域的函数（见 collect_regions），悬停、展开等变化靠它发现
+        返回需要交给 pygame.display.update 的矩形列表
+        """
+        self.update_messages()
+        regions = self.collect_regions(screen, overlay_regions() if overlay_regions else None)
+        screen_rect = screen.get_rect()
+
+        if self.needs_full_redraw:
+            dirty = [screen_rect]
+        else:
+            dirty = []
+            for key, (rect, signature) in regions.items():
+                old = self.regions.get(key)
+                if old is None or old[1] != signature or old[0] != rect:
+                    dirty.append(rect)
+                    if old is not None:
+                        dirty.append(old[0])
+            for key, (rect, signature) in self.regions.items():
+                if key not in regions:
+                    dirty.append(rect)
+
+        self.regions = regions
+        self.needs_full_redraw = False
+
+        dirty = merge_rects([rect.clip(screen_rect) for rect in dirty])
+        if not dirty:
+            return dirty
+        # 整个场景只画一遍：裁剪到所有脏区域的外包矩形，包围盒内没变的部分画出来和原来一样
+        bounds = dirty[0].unionall(dirty[1:])
+        screen.set_clip(bounds)
+        screen.fill(BLACK)
+        self.draw_scene(screen)
+        if overlay:
+            overlay(screen)
+        screen.set_clip(None)
+        return dirty
+
     def game_over(self,screen):
         # overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
         # overlay.set_alpha(128)
@@ -692,9 +615,9 @@ class FightScene:
         screen.fill(BLACK)
         
         if not self.enemies:
-            end_text = self.large_font.render("Congratulations!", True, GREEN)
+            end_text = render_text(self.large_font, "Congratulations!", True, GREEN)
         else:
-            end_text = self.font.render("You Failed!", True, RED)
+            end_text = render_text(self.font, "You Failed!", True, RED)
             render_ascii_art(screen, label="grave",x=100, y=200, font_size=24, color=WHITE)
             character = load_image('arts/grave.png')
             screen.blit(character, (800, 50))
@@ -702,15 +625,13 @@ class FightScene:
         end_rect = end_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2+200))
         screen.blit(end_text, end_rect)
         
-        restart_text = self.font.render("Press q to return Menu,r to restart", True, WHITE)
+        restart_text = render_text(self.font, "Press q to return Menu,r to restart", True, WHITE)
         restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 220))
         screen.blit(restart_text, restart_rect)    
     
     def restart_game(self):
-        self.player = Player(2)
-        self.enemies = [Enemy(4)]
-        self.game_state = "player_turn"
-        self.turn_count = 0
-        self.message = []
+        self.timeline.clear()
+        self.engine = self.create_engine()
+        self.invalidate()
 
 
@@ -29,3 +29,31 @@ def get_font(lang: str, name: str, size: int = 16):
         _font_cache[key] = pygame.font.Font(font_path, size)
 
     return _font_cache[key]
+
+
+# ===== 文字渲染缓存 =====
+# 大部分 UI 文字每帧都一样，渲染结果按 (字体, 文本, 抗锯齿, 颜色) 缓存
+from cache import LRUCache
+
+TEXT_CACHE_MAX_ITEMS = 2048
+TEXT_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+def _surface_bytes(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+_text_cache = LRUCache(max_items=TEXT_CACHE_MAX_ITEMS, max_bytes=TEXT_CACHE_MAX_BYTES, sizeof=_surface_bytes)
+
+def render_text(font, text, antialias=True, color=(255, 255, 255)):
+    """
+    等价于 font.render(text, antialias, color)，但结果会被缓存复用
+    返回的 Surface 是共享的，不要对它 set_alpha / fill，需要修改时先 copy()
+    """
+    key = (font, text, antialias, tuple(color))
+    surface = _text_cache.get(key)
+    if surface is None:
+        surface = font.render(text, antialias, color)
+        _text_cache.put(key, surface)
+    return surface
+
+def get_text_cache_stats():
+    return _text_cache.stats()
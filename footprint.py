@@ -0,0 +1,45 @@
+# footprint.py
+# 武器攻击范围的位掩码：第 i 位表示第 i 格会被打到
+# 每种 (pattern, 棋盘大小) 预先算好所有 (位置, 朝向) 的掩码，命中判定变成 footprint & 占用掩码
+
+_tables = {}   # (pattern, grid_size) -> {1: [掩码...], -1: [掩码...]}，下标是攻击者位置
+
+
+def pattern_mask(pattern, origin, direction, grid_size):
+    """直接计算：pattern 按朝向翻转后落在棋盘内的格子"""
+    mask = 0
+    for offset in pattern:
+        pos = origin + offset * direction
+        if 0 <= pos < grid_size:
+            mask |= 1 << pos
+    return mask
+
+
+def footprint(pattern, origin, direction, grid_size):
+    """查表取掩码，第一次用到某个 pattern 时整张表一起算好；攻击者不在棋盘上时直接计算"""
+    if not 0 <= origin < grid_size:
+        return pattern_mask(pattern, origin, direction, grid_size)
+    key = (pattern, grid_size)
+    table = _tables.get(key)
+    if table is None:
+        table = _tables[key] = {
+            d: [pattern_mask(pattern, pos, d, grid_size) for pos in range(grid_size)]
+            for d in (1, -1)
+        }
+    return table[direction][origin]
+
+
+def iter_bits(mask):
+    """从低位到高位依次给出置位的格子"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def range_mask(start, end):
+    """[start, end) 区间的掩码"""
+    start = max(start, 0)
+    if end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << start
@@ -1,4 +1,5 @@
 import pygame
+from font_manager import render_text
 
     
 class HelpSystem:
@@ -47,5 +48,5 @@ class HelpSystem:
         screen.blit(help_bg, (100, 100))
         # print(self.help_texts)
         for i, line in enumerate(lines):
-            text_surf = font.render(line, True, (255, 255, 255))
+            text_surf = render_text(font, line, True, (255, 255, 255))
             screen.blit(text_surf, (120, 120 + i * 28))
@@ -0,0 +1,150 @@
+# level_store.py
+# 多层地牢的存档：离开的楼层按层数存起来，回来时原样取回（地形、事件、怪物都不丢）
+# 最近去过的几层留在内存（LRUCache，按条数和估算字节数限额），被挤出去的写成二进制文件放到磁盘，回来时再读
+# 文件格式: 魔数 + 头部(宽, 高, 层数, 玩家 y, x) + zlib 压缩的地形字节 + zlib 压缩的 JSON 附加信息
+
+import json
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import LRUCache
+
+MAGIC = b"DLV1"
+_HEADER = struct.Struct("<4sIIiii")
+_LENGTH = struct.Struct("<I")
+
+
+def pack_level(width, height, level, player_pos, tiles, meta):
+    """把一层地牢编码成 bytes；meta 是能转成 JSON 的事件、怪物等信息"""
+    body = zlib.compress(bytes(tiles), 1)   # 地形重复度高，最快一档已经能压到 1/7 左右
+    extra = zlib.compress(json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+    return b"".join((_HEADER.pack(MAGIC, width, height, level, player_pos[0], player_pos[1]),
+                     _LENGTH.pack(len(body)), body, _LENGTH.pack(len(extra)), extra))
+
+
+def unpack_level(data):
+    """pack_level 的逆过程，返回 dict(width, height, level, player_pos, tiles, meta)"""
+    magic, width, height, level, y, x = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("不是地牢存档")
+    offset = _HEADER.size
+    (size,) = _LENGTH.unpack_from(data, offset)
+    offset += _LENGTH.size
+    tiles = bytearray(zlib.decompress(data[offset:offset + size]))
+    offset += size
+    (size,) = _LENGTH.unpack_from(data, offset)
+    offset += _LENGTH.size
+    meta = json.loads(zlib.decompress(data[offset:offset + size]).decode("utf-8"))
+    if len(tiles) != width * height:
+        raise ValueError("地牢存档尺寸不符")
+    return {"width": width, "height": height, "level": level, "player_pos": [y, x], "tiles": tiles, "meta": meta}
+
+
+class LevelStore:
+    """
+    stash(depth, level): 离开一层时存进来；take(depth): 进入一层时取出，没存过返回 None
+    当前所在的楼层不在存档里（取出即移除），所以写到磁盘的永远是离开时的最终状态
+    encode / decode: 楼层对象和 bytes 互转（Dungeon.to_bytes / Dungeon.from_bytes）
+    sizeof: 估算楼层占用内存的函数，配合 max_bytes 使用
+    background_spill: 写盘放到单独的写线程，stash 不等编码和写文件；读同一层前会先等它写完
+    """
+    def __init__(self, encode, decode, max_levels=4, max_bytes=64 * 1024 * 1024, sizeof=None, directory=None,
+                 background_spill=False):
+        self.encode = encode
+        self.decode = decode
+        self.directory = directory or tempfile.mkdtemp(prefix="dungeon_levels_")
+        self._owns_directory = directory is None
+        self._memory = LRUCache(max_items=max_levels, max_bytes=max_bytes, sizeof=sizeof, on_evict=self._spill)
+        self._on_disk = set()
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="level-spill") if background_spill else None
+        self._pending = {}   # 层数 -> 还没写完的 Future
+        self.spills = 0
+        self.loads = 0
+
+    def _path(self, depth):
+        return os.path.join(self.directory, f"level_{depth}.bin")
+
+    def _spill(self, depth, level):
+        """被挤出内存的楼层写盘（有写线程就交给它）"""
+        self._on_disk.add(depth)
+        self.spills += 1
+        if self._writer is not None:
+            self._pending[depth] = self._writer.submit(self._write, depth, level)
+        else:
+            self._write(depth, level)
+
+    def _wait(self, depth):
+        future = self._pending.pop(depth, None)
+        if future is not None:
+            future.result()
+
+    def _write(self, depth, level):
+        """先写临时文件再改名，写一半不会留下坏档"""
+        path = self._path(depth)
+        with open(path + ".tmp", "wb") as f:
+            f.write(self.encode(level))
+        os.replace(path + ".tmp", path)
+
+    def __contains__(self, depth):
+        return depth in self._memory or depth in self._on_disk
+
+    def stash(self, depth, level):
+        self._drop_file(depth)
+        self._memory.put(depth, level)
+
+    def on_disk(self, depth):
+        return depth in self._on_disk
+
+    def load(self, depth):
+        """只读取磁盘上的存档并解码，不改动存档状态（后台预取用）"""
+        future = self._pending.get(depth)
+        if future is not None:
+            future.result()
+        with open(self._path(depth), "rb") as f:
+            return self.decode(f.read())
+
+    def forget(self, depth):
+        """楼层已经由别处取走（如后台预取），把这里的副本删掉"""
+        self._memory.discard(depth)
+        self._drop_file(depth)
+
+    def take(self, depth):
+        level = self._memory.get(depth)
+        if level is not None:
+            self._memory.discard(depth)
+            return level
+        if depth not in self._on_disk:
+            return None
+        level = self.load(depth)
+        self._drop_file(depth)
+        self.loads += 1
+        return level
+
+    def _drop_file(self, depth):
+        if depth in self._on_disk:
+            self._on_disk.discard(depth)
+            self._wait(depth)
+            try:
+                os.remove(self._path(depth))
+            except OSError:
+                pass
+
+    def memory_levels(self):
+        return self._memory.keys()
+
+    def disk_levels(self):
+        return sorted(self._on_disk)
+
+    def close(self):
+        """删除磁盘上的存档（目录是自己建的就整个删掉）"""
+        self._memory.clear()
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+        for depth in list(self._on_disk):
+            self._drop_file(depth)
+        if self._owns_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,105 @@
+# position_index.py
+# 敌人的位置索引：位置 -> 单位 的字典 + 有序的占用位置列表
+# 占用查询 O(1)，某方向最近单位、两点之间是否有阻挡 O(log n)
+# mask 是占用位掩码（第 i 位 = 第 i 格有单位），给武器命中判定做位运算
+
+from bisect import bisect_left, bisect_right, insort
+
+
+class PositionIndex:
+    """
+    同一格可能暂时站着多个单位（冲刺落点等），所以每格存一个列表
+    positions 只记录有单位的格子，始终保持升序
+    """
+    def __init__(self):
+        self._cells = {}      # 位置 -> [单位, ...]
+        self.positions = []   # 有序的占用位置（只读）
+        self.mask = 0         # 占用位掩码（只记录非负位置，只读）
+        self.offboard = 0     # 负位置（被挤出棋盘）的占用格数，不为 0 时 mask 不完整
+
+    def __len__(self):
+        return sum(len(pawns) for pawns in self._cells.values())
+
+    def __contains__(self, pos):
+        return pos in self._cells
+
+    def clear(self):
+        self._cells.clear()
+        self.positions.clear()
+        self.mask = 0
+        self.offboard = 0
+
+    def add(self, pawn, pos=None):
+        pos = pawn.position if pos is None else pos
+        pawns = self._cells.get(pos)
+        if pawns is None:
+            self._cells[pos] = [pawn]
+            insort(self.positions, pos)
+            if pos >= 0:
+                self.mask |= 1 << pos
+            else:
+                self.offboard += 1
+        else:
+            pawns.append(pawn)
+
+    def remove(self, pawn, pos=None):
+        pos = pawn.position if pos is None else pos
+        pawns = self._cells.get(pos)
+        if not pawns or pawn not in pawns:
+            return
+        pawns.remove(pawn)
+        if not pawns:
+            del self._cells[pos]
+            del self.positions[bisect_left(self.positions, pos)]
+            if pos >= 0:
+                self.mask &= ~(1 << pos)
+            else:
+                self.offboard -= 1
+
+    def move(self, pawn, old_pos, new_pos):
+        """Actor.on_position_change 回调"""
+        if old_pos != new_pos:
+            self.remove(pawn, old_pos)
+            self.add(pawn, new_pos)
+
+    def get(self, pos):
+        """该格的第一个单位，没有则 None"""
+        pawns = self._cells.get(pos)
+        return pawns[0] if pawns else None
+
+    def get_all(self, pos):
+        return list(self._cells.get(pos, ()))
+
+    def nearest_position(self, pos, direction=None):
+        """
+        最近的占用位置：direction=1 只找右边，-1 只找左边，None 两边都找（包括 pos 本身）
+        距离相同时取左边；需要两边都拿到时用 nearest_positions
+        """
+        nearest = self.nearest_positions(pos, direction)
+        return nearest[0] if nearest else None
+
+    def nearest_positions(self, pos, direction=None):
+        """同 nearest_position，但两边距离相同时左右两个位置都返回（升序）"""
+        positions = self.positions
+        if direction == 1:
+            i = bisect_right(positions, pos)
+            return positions[i:i + 1]
+        if direction == -1:
+            i = bisect_left(positions, pos)
+            return positions[i - 1:i] if i > 0 else []
+
+        i = bisect_left(positions, pos)
+        right = positions[i] if i < len(positions) else None
+        left = positions[i - 1] if i > 0 else None
+        if left is None:
+            return positions[i:i + 1]
+        if right is None or pos - left < right - pos:
+            return [left]
+        if right - pos < pos - left:
+            return [right]
+        return [left, right]
+
+    def any_between(self, start, end):
+        """(start, end) 开区间内是否有单位"""
+        i = bisect_right(self.positions, start)
+        return i < len(self.positions) and self.positions[i] < end
@@ -0,0 +1,91 @@
+# prefetch.py
+# 后台预取：玩家在当前楼层探索时，后台线程先把相邻楼层准备好（新生成或从磁盘读回）
+# 走楼梯时直接取走现成的结果；结果由 key 决定（楼层种子由层数推出），作废后重做得到的也一样
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """
+    submit(key, build): 排队在后台执行 build()，结果记在 key 下（同一 key 已在排队/执行/完成就忽略）
+    take(key): 主线程取结果；key 正在执行就等它做完，还在排队就撤掉并返回 None（调用方自己做）
+    retain(keys): 只保留这些 key，其余排队的撤掉、做完的丢掉、正在做的做完后丢掉
+    """
+    def __init__(self, name="prefetch"):
+        self._cond = threading.Condition()
+        self._queue = []          # [(key, build)]
+        self._results = {}
+        self._running = None      # 正在执行的 key
+        self._drop_running = False
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def __contains__(self, key):
+        with self._cond:
+            return key in self._results or key == self._running or any(k == key for k, _ in self._queue)
+
+    def submit(self, key, build):
+        with self._cond:
+            if key == self._running:
+                self._drop_running = False
+                return
+            if key in self._results or any(k == key for k, _ in self._queue):
+                return
+            self._queue.append((key, build))
+            self._cond.notify_all()
+
+    def take(self, key):
+        with self._cond:
+            self._queue = [(k, b) for k, b in self._queue if k != key]
+            while self._running == key:
+                self._cond.wait()
+            result = self._results.pop(key, None)
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return result
+
+    def retain(self, keys):
+        keys = set(keys)
+        with self._cond:
+            self._queue = [(k, b) for k, b in self._queue if k in keys]
+            self._results = {k: v for k, v in self._results.items() if k in keys}
+            if self._running is not None and self._running not in keys:
+                self._drop_running = True
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._queue = []
+            self._results = {}
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._queue:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                key, build = self._queue.pop(0)
+                self._running = key
+                self._drop_running = False
+
+            result = None
+            try:
+                result = build()
+            except Exception:
+                logger.exception("prefetch failed for %r", key)
+            finally:
+                with self._cond:
+                    if result is not None and not self._drop_running and not self._closed:
+                        self._results[key] = result
+                    self._running = None
+                    self._cond.notify_all()
@@ -0,0 +1,110 @@
+# speculation.py
+# 预测执行：玩家回合开始时复制一份局面，后台线程趁玩家思考把每种玩家行动的整轮结果都推演出来
+# 玩家真正行动后，敌人阶段直接采用对应的推演结果（CombatEngine.adopt），其余结果作废
+# 引擎是确定的（随机数状态随副本复制），所以采用的结果和现场计算完全一样
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class Speculator:
+    """
+    start(engine, key): 主线程调用，让后台线程从当前局面开始推演（之前没用完的推演作废）
+    wait_snapshot(): 主线程改动局面前调用，等后台线程复制完局面（复制也放在后台，不占主线程）
+    take(key, action): 主线程调用，等后台线程停在两个行动之间后取出对应结果，没有则返回 None
+    key 标识推演时的局面（CombatEngine.speculation_key：回合编号 + 玩家改动版本），take 时对不上就不采用
+    后台线程只碰自己的副本；take 返回前它一定处于空闲，主线程随后的敌人阶段不会和它同时跑共享缓存
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._job = None          # (key, 局面副本, 待推演的行动)；行动为 None 表示还没复制局面
+        self._key = None
+        self._results = {}        # 行动 -> 推演完的引擎
+        self._busy = False
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+        self._thread = threading.Thread(target=self._run, name="speculator", daemon=True)
+        self._thread.start()
+
+    def start(self, engine, key):
+        with self._cond:
+            self._key = key
+            self._results = {}
+            self._job = (key, engine, None)
+            self._cond.notify_all()
+
+    def wait_snapshot(self):
+        with self._cond:
+            while self._job is not None and self._job[2] is None:
+                self._cond.wait()
+
+    def take(self, key, action):
+        with self._cond:
+            self._job = None      # 剩下的行动不用再推演了
+            while self._busy:
+                self._cond.wait()
+            result = self._results.pop(action, None) if key == self._key else None
+            self._results = {}
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return result
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._job = None
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._job:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                key, base, actions = self._job
+                if actions is None:
+                    action = None
+                else:
+                    action = actions.pop(0)
+                    if not actions:
+                        self._job = None
+                self._busy = True
+
+            if action is None:
+                self._snapshot(key, base)
+                continue
+
+            result = None
+            try:
+                child = base.clone()
+                acted, _ = child.player_action(action)
+                if acted:
+                    result = child
+            except Exception:
+                logger.exception("speculation failed for %r", action)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    if result is not None and key == self._key:
+                        self._results[action] = result
+                    self._cond.notify_all()
+
+    def _snapshot(self, key, engine):
+        """复制真实局面（主线程此时在 wait_snapshot 之外只会读它）"""
+        try:
+            base = engine.clone()
+            job = (key, base, base.player_actions())
+        except Exception:
+            logger.exception("speculation snapshot failed")
+            job = None
+        with self._cond:
+            self._busy = False
+            if self._job is not None and self._job[0] == key and self._job[2] is None:
+                self._job = job
+            self._cond.notify_all()
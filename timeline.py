@@ -0,0 +1,57 @@
+# timeline.py
+# 动作播放时间轴：把连招拆成按帧推进的步骤，代替 pygame.time.wait 阻塞主循环
+
+from collections import deque
+
+
+class ActionTimeline:
+    """
+    每个步骤开始时执行一次回调，然后停留 duration 毫秒再进入下一步
+    回调执行期间新加入的步骤会插在队首（例如敌人行动时施放的武器），保证先后顺序
+    """
+    def __init__(self, step_duration=500, speed=1.0):
+        self.step_duration = step_duration  # 默认每步停留时间（毫秒）
+        self.speed = speed                  # 播放倍速，>1 加快
+        self.steps = deque()
+        self.wait = 0                       # 当前步骤剩余停留时间
+        self._nested = None                 # 回调执行期间新加入的步骤
+
+    def schedule(self, callback, duration=None):
+        step = (callback, self.step_duration if duration is None else duration)
+        if self._nested is not None:
+            self._nested.append(step)
+        else:
+            self.steps.append(step)
+
+    def is_busy(self):
+        return bool(self.steps) or self.wait > 0
+
+    def update(self, dt):
+        """按帧推进，dt 为距上一帧的毫秒数"""
+        self.wait -= dt * self.speed
+        while self.wait <= 0:
+            if not self.steps:
+                self.wait = 0
+                break
+            callback, duration = self.steps.popleft()
+            self._run(callback)
+            self.wait += duration
+
+    def skip(self):
+        """立即执行完所有剩余步骤"""
+        self.wait = 0
+        while self.steps:
+            callback, _ = self.steps.popleft()
+            self._run(callback)
+
+    def clear(self):
+        self.steps.clear()
+        self.wait = 0
+
+    def _run(self, callback):
+        self._nested = []
+        try:
+            callback()
+        finally:
+            nested, self._nested = self._nested, None
+            self.steps.extendleft(reversed(nested))
@@ -0,0 +1,128 @@
+# turn_scheduler.py
+# 回合调度：按行动力（energy）排序的优先队列，每轮每个单位最多行动一次
+
+import heapq
+
+ACTION_COST = 100   # 行动一次消耗的行动力
+DEFAULT_SPEED = 100 # 每轮恢复的行动力，100 表示每轮都能行动
+
+
+class TurnScheduler:
+    """
+    start_round() 给所有单位加行动力，返回本轮按行动力从高到低排好的行动顺序
+    行动力相同按加入顺序；速度低于 ACTION_COST 的单位会隔轮行动
+
+    常见情况是所有单位速度相同、行动力也相同（一起加入、一起行动），这时每轮的顺序都是加入顺序，
+    不会变：只记一个共同的行动力，行动顺序跨轮保留，加入/移除时增量维护，不再每轮建堆
+    行动顺序用 dict 当有序集合（单位 -> None），移除是 O(1)，整波敌人一起死也不会退化成 O(n²)
+    有单位的速度或行动力不同时退回逐个计算 + 堆排序，之后又回到一致时再切回来；
+    加入之后才改了 speed 的单位在下一轮开始时发现，同样退回逐个计算
+    """
+    def __init__(self):
+        self._energy = {}   # 单位 -> 当前行动力（共用模式下不用其中的值）
+        self._order = {}    # 单位 -> 加入序号
+        self._next_order = 0
+        self._shared = 0    # 共用模式：所有单位的行动力
+        self._speed = None  # 共用模式：所有单位的速度（还没有单位时为 None）
+        self._queue = {}    # 共用模式：按加入顺序排好的单位 -> None；为 None 表示逐个计算
+
+    def __len__(self):
+        return len(self._energy)
+
+    def __contains__(self, actor):
+        return actor in self._energy
+
+    def add(self, actor, energy=0):
+        self._energy[actor] = energy
+        self._order[actor] = self._next_order
+        self._next_order += 1
+        if self._queue is not None:
+            speed = getattr(actor, "speed", DEFAULT_SPEED)
+            if not self._queue:
+                self._shared, self._speed = energy, speed
+            if energy == self._shared and speed == self._speed:
+                self._queue[actor] = None
+            else:
+                self._split()
+
+    def remove(self, actor):
+        if self._energy.pop(actor, None) is not None and self._queue is not None:
+            del self._queue[actor]
+        self._order.pop(actor, None)
+
+    def order_of(self, actor):
+        """加入序号：越早加入越小，行动力相同时按它排先后"""
+        return self._order[actor]
+
+    def energy(self, actor):
+        if self._queue is not None:
+            return self._shared if actor in self._energy else 0
+        return self._energy.get(actor, 0)
+
+    def _speed_changed(self):
+        """共用模式下有单位加入后改了 speed"""
+        speed = self._speed
+        return any(getattr(actor, "speed", DEFAULT_SPEED) != speed for actor in self._queue)
+
+    def _split(self):
+        """退出共用模式：把共同的行动力写回每个单位"""
+        for actor in self._queue:
+            self._energy[actor] = self._shared
+        self._queue = None
+
+    def copy(self, mapping):
+        """复制调度状态，mapping: 旧单位 -> 新单位"""
+        scheduler = TurnScheduler()
+        scheduler._energy = {mapping[a]: e for a, e in self._energy.items()}
+        scheduler._order = {mapping[a]: o for a, o in self._order.items()}
+        scheduler._next_order = self._next_order
+        scheduler._shared, scheduler._speed = self._shared, self._speed
+        scheduler._queue = None if self._queue is None else {mapping[a]: None for a in self._queue}
+        return scheduler
+
+    def clear(self):
+        self._energy.clear()
+        self._order.clear()
+        self._queue = {}
+
+    def start_round(self):
+        if self._queue is not None and self._speed_changed():
+            self._split()
+        if self._queue is not None:
+            if not self._queue:
+                return []
+            energy = self._shared + self._speed
+            if energy < ACTION_COST:
+                self._shared = energy
+                return []
+            self._shared = min(energy - ACTION_COST, ACTION_COST)
+            return list(self._queue)
+
+        heap = []
+        for actor, energy in self._energy.items():
+            energy += getattr(actor, "speed", DEFAULT_SPEED)
+            self._energy[actor] = energy
+            if energy >= ACTION_COST:
+                heap.append((-energy, self._order[actor], actor))
+        heapq.heapify(heap)
+
+        order = []
+        while heap:
+            _, _, actor = heapq.heappop(heap)
+            # 每轮最多行动一次，多余的行动力最多保留一次行动的量
+            self._energy[actor] = min(self._energy[actor] - ACTION_COST, ACTION_COST)
+            order.append(actor)
+        self._rejoin()
+        return order
+
+    def _rejoin(self):
+        """所有单位的速度和行动力又一致了就回到共用模式"""
+        energies = set(self._energy.values())
+        if len(energies) > 1:
+            return
+        speeds = {getattr(actor, "speed", DEFAULT_SPEED) for actor in self._energy}
+        if len(speeds) > 1:
+            return
+        self._shared = energies.pop() if energies else 0
+        self._speed = speeds.pop() if speeds else None
+        self._queue = dict.fromkeys(sorted(self._energy, key=self._order.__getitem__))